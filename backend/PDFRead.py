@@ -1,31 +1,62 @@
 #pdfread.py
-from flask import Flask, request, jsonify
-import PyPDF2
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 import os
 import sys
 from flask_cors import CORS
-from pymongo import MongoClient
-import openai
 from dotenv import load_dotenv
 import re
 import json
+import asyncio
+import datetime
+import shutil
+import tempfile
+import uuid
 
-app = Flask(__name__)
-CORS(app)  # Allow frontend requests
-
+# Load .env before the local imports: clients, llm_gateway, pdf_extract and friends read their limits at import
 load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-openai_client = openai
+from catalog import get_catalog, normalize_code
+from clients import get_mongo_client, get_openai_client, pool_stats
+from llm_cache import cached_chat_completion, cached_chat_completion_async, get_llm_cache, stream_chat_completion
+from llm_gateway import LLMGateway, get_llm_limiter
+from preference_rules import (
+    RULE_CONFIDENCE_THRESHOLD, criteria_from_signals, scan_message,
+    schedule_preferences_from_signals, student_preferences_from_signals,
+)
+from meeting_times import TIME_OF_DAY_RANGES, day_masks_including, parse_days, parse_meetings
+from schedule_solver import solve_schedules, format_schedule
+from curriculum_index import curriculum_fingerprint, get_curriculum_index
+from incremental_planner import get_planner, prompt_fingerprint
+from jobs import JobManager, JobQueueFull, create_job_store
+from prompt_builder import (
+    PROMPT_MAX_CANDIDATES, PROMPT_TOKEN_BUDGET, build_messages, course_row, get_prompt_stats, pack_code_list, pack_course_table, rank_courses,
+)
+from pdf_extract import PDF_MAX_BYTES, PDFLimitError, PDFTimeoutError, extract_text, read_pdf_bytes
+from transcript_parser import compile_course_line, courses_to_dicts, extract_student_identity, parse_transcript_lines, student_key
+from transcript_cache import get_transcript_cache, transcript_digest
+from upload_pipeline import find_async, find_one_async, get_async_runtime, update_one_async
+from session_store import DEFAULT_SESSION_ID, SESSION_TTL_SECONDS, create_session_store
+
+app = Flask(__name__)
+# Only the frontend's origins may call the API with credentials; the session id is exposed so it can echo it back
+CORS_ORIGINS = [origin.strip() for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000,http://127.0.0.1:3000").split(",") if origin.strip()]
+CORS(app, origins=CORS_ORIGINS, supports_credentials=True, expose_headers=["X-Session-Id"])
+
+# Every completion goes through the gateway: shared concurrency limit, coalescing and retries
+openai_client = LLMGateway(get_openai_client())
 UPLOAD_FOLDER = "/tmp"
 ALLOWED_EXTENSIONS = {"pdf"}
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
+# Uploads are buffered in memory up to this size, then spill to an anonymous temp file
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+# Reject oversized uploads before they are read (PDF limit plus multipart overhead)
+app.config["MAX_CONTENT_LENGTH"] = PDF_MAX_BYTES + 64 * 1024
 
-# Obtain MongoDB connection string from environment variables
-mongo_connection_string = os.getenv("MONGO_URI")
+# Shared, pooled MongoDB client (see clients.py for pool size and timeouts)
+client = get_mongo_client()
 
-# Initialize MongoDB client
-client = MongoClient(mongo_connection_string)
+# Maximum number of courses the local schedule solver searches over
+MAX_SCHEDULE_CANDIDATES = 25
 
 # Collection for storing recommended courses
 RECOMMENDED_COURSES = 'course-assistant-recommended-courses'
@@ -44,17 +75,84 @@ course_codes = [
     'YIDD'
 ]
 
+# Transcript course lines: a subject above followed by a course number, title, units and grade
+COURSE_LINE = compile_course_line(course_codes)
+
 def allowed_file(filename):
     """Check if the uploaded file is a PDF."""
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def extract_text_from_pdf(pdf_path):
-    """Extract text from a PDF file."""
+def wants_stream(data=None):
+    """Check if the client asked for a streamed (server-sent events) response."""
+    if request.args.get('stream', '').lower() in ('1', 'true'):
+        return True
+    return bool(data and data.get('stream') is True)
+
+def wants_job():
+    """Check if the client asked for /upload to run as a background job."""
+    return (request.args.get('async', '') or request.form.get('async', '')).lower() in ('1', 'true')
+
+def current_session_id():
+    """The caller's session: X-Session-Id header, session_id cookie or session_id parameter.
+
+    A client that sends none gets a new session. Every response that used a
+    session returns its id in an X-Session-Id header (and a new one in a
+    session_id cookie), which the frontend sends back on later requests.
+    """
+    if 'session_id' in g:
+        return g.session_id
+    data = request.get_json(silent=True) if request.is_json else None
+    session_id = (
+        request.headers.get('X-Session-Id')
+        or request.cookies.get('session_id')
+        or request.values.get('session_id')
+        or (data.get('session_id') if isinstance(data, dict) else None)
+    )
+    if not session_id:
+        session_id = g.new_session_id = uuid.uuid4().hex
+    g.session_id = session_id
+    return session_id
+
+@app.after_request
+def set_session_headers(response):
+    """Hand the request's session id back to the client."""
+    if 'session_id' in g:
+        response.headers['X-Session-Id'] = g.session_id
+    if 'new_session_id' in g:
+        response.set_cookie('session_id', g.new_session_id, max_age=SESSION_TTL_SECONDS, httponly=True, samesite='Lax')
+    return response
+
+def sse_event(data, event=None):
+    """Format one server-sent event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def stream_events(chunks, *local_events):
+    """Send locally computed events first, then forward text chunks as they arrive."""
+    def generate():
+        for event, data in local_events:
+            yield sse_event(data, event)
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                yield sse_event({"delta": chunk})
+        except Exception as e:
+            print(f"Error while streaming response: {e}", file=sys.stderr)
+            yield sse_event({"error": str(e)}, "error")
+            return
+        yield sse_event({"response": "".join(parts)}, "done")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def extract_text_from_pdf(source):
+    """Extract text from a PDF (path, bytes or file object) on the extraction process pool."""
     try:
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
-            text = ''.join([page.extract_text() or "" for page in reader.pages])
-        return text
+        return extract_text(source)
     except Exception as e:
         print(f"Error reading PDF: {e}", file=sys.stderr)
         raise
@@ -68,73 +166,80 @@ def clean_text(text):
     ]
     return cleaned_lines
 
-def contains_any(main_string, string_array):
-    """Check if any string in the array is found in the main string."""
-    return any(substring in main_string for substring in string_array)
-
 def parse_courses(cleaned_lines):
-    """Parse courses from transcript text."""
-    courses_by_quarter = {}
-    current_quarter = None
-    all_grades = {"A", "B", "C", "D", "F", "P", "NP", "W", "I", "IP"}
-
-    for line in cleaned_lines:
-        if 'Quarter' in line:
-            current_quarter = line
-            courses_by_quarter[current_quarter] = []
-        elif current_quarter and any(subject in line for subject in course_codes):
-            parts = line.split()
-
-            if len(parts) >= 4:
-                course_code = ' '.join(parts[0:2])
-
-                if not contains_any(parts[-2], all_grades):
-                    course_name = ' '.join(parts[2:-3])
-                    credits_earned = parts[-2]
-                    grade = "IP"
-                else:
-                    course_name = ' '.join(parts[2:-4])
-                    credits_earned = parts[-3]
-                    grade = parts[-2]
-
-                courses_by_quarter[current_quarter].append({
-                    'course_code': course_code,
-                    'course_name': course_name,
-                    'credits_earned': credits_earned,
-                    'grade': grade
-                })
-    return courses_by_quarter
+    """Parse courses from transcript text into TranscriptCourse records by quarter."""
+    return parse_transcript_lines(cleaned_lines, COURSE_LINE)
 
 def extract_major(cleaned_lines):
     """Extract the declared major from transcript text."""
     matching_lines = [line for line in cleaned_lines if 'Plan:' in line]
     return matching_lines[-2].split('Plan:')[-1].strip() if len(matching_lines) >= 2 else "Unknown"
 
-def generate_schedule(courses, student_history, required_courses, upper_electives_taken, upper_electives_needed, prerequisites, model="chatgpt-4o-latest"):
+def document_course_row(doc, code=None, prereqs=None):
+    """Prompt table row for a classInfo document."""
+    return course_row(
+        normalize_code(code or doc.get("Class Code")),
+        title=doc.get("Class Name", ""),
+        units=doc.get("Credits", ""),
+        times=doc.get("Days & Times", ""),
+        ge=doc.get("GE", ""),
+        prereqs=doc.get("Prereqs", "") if prereqs is None else prereqs,
+    )
+
+def catalog_course_rows(catalog, codes, prerequisites=None):
+    """Prompt table rows for catalog codes, with details from the catalog snapshot."""
+    rows = []
+    for code in codes:
+        doc = catalog.get(code) or {}
+        rows.append(document_course_row(doc, code, (prerequisites or {}).get(doc.get("Class Code", code))))
+    return rows
+
+def flatten_requirement_groups(groups):
+    return [course for group in groups for course in (group if isinstance(group, list) else [group])]
+
+def format_requirement_groups(groups):
+    """Compact 'A or B; C' rendering of requirement groups."""
+    return "; ".join(" or ".join(group) if isinstance(group, list) else str(group) for group in groups) or "None"
+
+def build_schedule_messages(courses, student_history, required_courses, upper_electives_taken, upper_electives_needed, prerequisites=None, preferences=None):
+    """Build the chat messages for the transcript schedule recommendation.
+
+    Candidate courses are ranked locally and only the best are packed, with
+    their prerequisites, into a token-budgeted table. The list of open
+    electives is capped first and its tokens come out of the table's budget.
+    """
+    catalog = get_catalog(client)
+    candidates = rank_courses(
+        catalog_course_rows(catalog, courses, prerequisites),
+        required_codes={normalize_code(code) for code in flatten_requirement_groups(required_courses)},
+        preferences=preferences,
+        unlock_counts=catalog.prerequisite_engine().unlock_counts()
+    )
+    electives_needed, _, electives_tokens = pack_code_list(upper_electives_needed)
+    course_table, rows_included, _ = pack_course_table(candidates, budget=PROMPT_TOKEN_BUDGET - electives_tokens)
+    
     prompt = f"""
-    Here is a list of available courses for next quarter:
+    Here is a table of available courses for next quarter, most relevant first:
     
-    {courses}
+    {course_table}
     
     The student has only taken the following courses:
-    {student_history}
+    {', '.join(student_history)}
 
-    The prerequisites for the courses are as follows:
-    
-    {prerequisites}
+    The prereqs column lists the prerequisites for each course.
 
     REMOVE CLASSES FOR CONSIDERATION FROM THE COURSE LIST THAT THE STUDENT DOES NOT HAVE THE PREREQUISITES FOR.
 
-    These are courses that the student still needs to take:
+    These are courses that the student still needs to take (one course from each group):
 
-    {required_courses}
+    {format_requirement_groups(required_courses)}
     prioritize courses that are prerequisites for future courses.
     
     This is the number of upper division electives the student has taken:
     {upper_electives_taken}
     Upper electives will be classes with course codes 100+.
-    This is the number of upper division electives the student needs to take:
-    {upper_electives_needed}
+    These are the upper division electives the student can still take:
+    {electives_needed}
 
     Pick at least 3 classes that provide a balanced schedule based on variety, workload, and prerequisites and which completes their general education in a timely fashion.
     PRIORITIZE REQUIRED CLASSES.
@@ -149,15 +254,16 @@ def generate_schedule(courses, student_history, required_courses, upper_elective
     If a class has discussion or lab sections, pick one that will be best for their schedule.
     """
 
-    response = openai_client.chat.completions.create(
+    return build_messages("upload_schedule", "You are an expert academic advisor.", prompt, rows_included, len(set(courses)))
+
+def generate_schedule(courses, student_history, required_courses, upper_electives_taken, upper_electives_needed, prerequisites=None, model="chatgpt-4o-latest"):
+    messages = build_schedule_messages(courses, student_history, required_courses, upper_electives_taken, upper_electives_needed, prerequisites)
+
+    response_message = cached_chat_completion(
+        openai_client,
         model=model,
-        messages=[
-            {"role": "system", "content": "You are an expert academic advisor."},
-            {"role": "user", "content": prompt},
-        ],
+        messages=messages,
     )
-    
-    response_message = response.choices[0].message.content
 
     return response_message
 
@@ -190,88 +296,81 @@ def extract_major_and_type(degree):
 
     return {"major": major, "type": degree_type}
 
-def query_courses_by_criteria(criteria):
-    """Query courses from MongoDB based on given criteria."""
-    db = client["course"]
-    collection = db['classInfo']
-    
+# Course number ranges for the difficulty level filter
+LEVEL_RANGES = {
+    'introductory': (1, 100),
+    'intermediate': (100, 200),
+    'advanced': (200, 300)
+}
+
+def build_criteria_query(criteria):
+    """Build the classInfo query for recommendation criteria.
+
+    Every predicate targets an indexed field (see indexes.py): Subject and
+    Course Number are derived from Class Code, Start Minute and Meeting Days
+    from Days & Times. The catalog snapshot fills them in on every refresh.
+    """
     query = {}
     
-    # Subject area filter
+    # Subject area filters
+    subject_filter = {}
     if criteria.get('subject'):
-        subject_regex = f"^{criteria['subject']}"
-        query['Class Code'] = {'$regex': subject_regex}
+        subject_filter['$eq'] = criteria['subject'].strip().upper()
     
-    # Excluded subject areas
     if criteria.get('excluded_subjects') and len(criteria['excluded_subjects']) > 0:
-        excluded_patterns = [f"^{subj}" for subj in criteria['excluded_subjects']]
-        if 'Class Code' not in query:
-            query['Class Code'] = {}
-        
-        if '$regex' in query['Class Code']:
-            existing_regex = query['Class Code']['$regex']
-            query['Class Code'] = {
-                '$regex': existing_regex,
-                '$not': {'$in': excluded_patterns}
-            }
-        else:
-            query['Class Code'] = {'$not': {'$in': excluded_patterns}}
+        subject_filter['$nin'] = [subj.strip().upper() for subj in criteria['excluded_subjects']]
+    
+    if subject_filter:
+        query['Subject'] = subject_filter
     
-    # Time of day filter
+    # Time of day filter (range over the precomputed start minute)
     if criteria.get('time_of_day'):
-        time_pattern = {
-            'morning': {'$regex': r'AM'},
-            'afternoon': {'$regex': r'12:00PM|1:00PM|2:00PM|3:00PM|4:00PM'},
-            'evening': {'$regex': r'5:00PM|6:00PM|7:00PM|8:00PM|9:00PM'}
-        }.get(criteria['time_of_day'])
+        time_range = TIME_OF_DAY_RANGES.get(criteria['time_of_day'])
         
-        if time_pattern:
-            query['Days & Times'] = time_pattern
+        if time_range:
+            query['Start Minute'] = {'$gte': time_range[0], '$lt': time_range[1]}
     
-    # Days of week filter
+    # Days of week filter (sections meeting on at least these days)
     if criteria.get('days'):
-        days_pattern = criteria['days']
-        if days_pattern == 'MWF':
-            query['Days & Times'] = {'$regex': r'M.*W.*F'}
-        elif days_pattern == 'TR':
-            query['Days & Times'] = {'$regex': r'T.*R'}
+        days_mask = parse_days(criteria['days'])
+        if days_mask:
+            query['Meeting Days'] = {'$in': day_masks_including(days_mask)}
     
-    # GE requirement filter
+    # GE requirement filter (anchored so it can use the GE index)
     if criteria.get('ge'):
-        query['GE'] = {'$regex': criteria['ge']}
+        query['GE'] = {'$regex': f"^{re.escape(criteria['ge'])}"}
     
-    # Difficulty level filter (this would need additional data or analysis)
+    # Difficulty level filter
     if criteria.get('level'):
-        level_map = {
-            'introductory': {'$regex': r' [1-9][0-9]$'},
-            'intermediate': {'$regex': r' 1[0-9][0-9]$'},
-            'advanced': {'$regex': r' 2[0-9][0-9]$'}
-        }.get(criteria['level'])
+        level_range = LEVEL_RANGES.get(criteria['level'])
         
-        if level_map:
-            if 'Class Code' in query:
-                # Handle complex queries where we already have Class Code filters
-                # This would require a more sophisticated approach with $and operators
-                pass
-            else:
-                query['Class Code'] = level_map
+        if level_range:
+            query['Course Number'] = {'$gte': level_range[0], '$lt': level_range[1]}
     
     if criteria.get('open_only') and criteria['open_only']:
         query['Status'] = 'Open'
     
+    return query
+
+def query_courses_by_criteria(criteria, student_info=None):
+    """Query courses from MongoDB based on given criteria.
+
+    With `from_potential_upper_div_list`, falls back to the student's remaining upper-division courses.
+    """
+    student_info = student_info or {}
+    # Loading the snapshot backfills the derived fields the query filters on
+    get_catalog(client)
+    db = client["course"]
+    collection = db['classInfo']
     
-    print(f"MongoDB Query: {query}")
+    query = build_criteria_query(criteria)
     
-    if 'Class Code' in query and isinstance(query['Class Code'], dict) and len(query['Class Code']) > 1:
-        conditions = []
-        for key, value in query['Class Code'].items():
-            conditions.append({f'Class Code.{key}': value})
-        query = {'$and': conditions}
+    print(f"MongoDB Query: {query}")
     
     courses = list(collection.find(query, {'_id': 0}).limit(10))
     
     if not courses and criteria.get('excluded_subjects'):
-        backup_query = {k: v for k, v in query.items() if k != 'Class Code'}
+        backup_query = {k: v for k, v in query.items() if k != 'Subject'}
         backup_courses = list(collection.find(backup_query, {'_id': 0}).limit(10))
         
         # Filter out excluded subjects manually
@@ -286,7 +385,7 @@ def query_courses_by_criteria(criteria):
                 return filtered_courses
     
 
-    if not courses and criteria.get('from_potential_upper_div_list') and 'remaining_upper_div_courses' in student_info:
+    if not courses and criteria.get('from_potential_upper_div_list') and student_info.get('remaining_upper_div_courses'):
         potential_courses = student_info['remaining_upper_div_courses']
         
         # Filter out excluded subjects if necessary
@@ -298,18 +397,31 @@ def query_courses_by_criteria(criteria):
             ]
         
         if potential_courses:
-            upper_div_courses = list(collection.find(
-                {"Class Code": {"$in": potential_courses}}, 
-                {'_id': 0}
-            ).limit(10))
+            upper_div_courses = get_catalog(client).get_many(potential_courses)[:10]
             
             return upper_div_courses
     
     return courses
 
 
+def extract_with_rules(message, shape):
+    """Run the rule-based extractor; return its shaped result, or None when confidence is low."""
+    signals, confidence = scan_message(message, course_codes)
+    if confidence >= RULE_CONFIDENCE_THRESHOLD:
+        print(f"Rule-based extraction (confidence {confidence}): {signals}")
+        return shape(signals)
+    print(f"Rule-based extraction confidence {confidence} too low, using OpenAI")
+    return None
+
 def extract_recommendation_criteria(message):
-    """Extract course recommendation criteria from user message using OpenAI."""
+    """Extract course recommendation criteria from user message.
+
+    Returns (criteria, path) where path is "rules" or "llm".
+    """
+    extracted_criteria = extract_with_rules(message, criteria_from_signals)
+    if extracted_criteria is not None:
+        return extracted_criteria, "rules"
+    
     extraction_prompt = f"""
     Extract course recommendation criteria from this message:
     "{message}"
@@ -332,7 +444,8 @@ def extract_recommendation_criteria(message):
     - For "I don't want any MATH or PHYS courses", include ["MATH", "PHYS"] in excluded_subjects
     """
     
-    response = openai_client.chat.completions.create(
+    response = cached_chat_completion(
+        openai_client,
         model="chatgpt-4o-latest",
         messages=[
             {"role": "system", "content": "You are a criteria extraction system."},
@@ -342,24 +455,28 @@ def extract_recommendation_criteria(message):
     
     # Parse the JSON response
     try:
-        extracted_criteria = json.loads(response.choices[0].message.content)
-        return extracted_criteria
+        extracted_criteria = json.loads(response)
+        return extracted_criteria, "llm"
     except Exception as e:
         print(f"Error parsing criteria JSON: {e}")
-        return {}
+        return {}, "llm"
 
 
-def format_course_recommendations(courses, criteria, student_history=None):
-    """Format course recommendations with OpenAI assistance."""
+def format_course_recommendations(courses, criteria, student_history=None, stream=False, student_info=None):
+    """Format course recommendations with OpenAI assistance.
+
+    With stream=True, returns an iterator of text chunks instead of a string.
+    """
     if not courses:
         if not criteria.get('from_potential_upper_div_list'):
             criteria['from_potential_upper_div_list'] = True
-            upper_div_courses = query_courses_by_criteria(criteria)
+            upper_div_courses = query_courses_by_criteria(criteria, student_info)
             
             if upper_div_courses:
-                return format_course_recommendations(upper_div_courses, criteria, student_history)
+                return format_course_recommendations(upper_div_courses, criteria, student_history, stream, student_info)
         
-        return "I couldn't find any courses matching your criteria. Could you try with different requirements?"
+        message = "I couldn't find any courses matching your criteria. Could you try with different requirements?"
+        return iter([message]) if stream else message
     
     courses_text = "\n".join([
         f"- {course['Class Code']}: {course['Class Name']} ({course.get('Credits', 'N/A')} credits)\n"
@@ -398,15 +515,21 @@ def format_course_recommendations(courses, criteria, student_history=None):
     IMPORTANT: Strictly avoid recommending any courses from departments the student asked to exclude.
     """
     
-    response = openai_client.chat.completions.create(
+    messages = [
+        {"role": "system", "content": "You are a helpful academic advisor for UC Santa Cruz."},
+        {"role": "user", "content": prompt},
+    ]
+    
+    if stream:
+        return stream_chat_completion(openai_client, model="chatgpt-4o-latest", messages=messages)
+    
+    response = cached_chat_completion(
+        openai_client,
         model="chatgpt-4o-latest",
-        messages=[
-            {"role": "system", "content": "You are a helpful academic advisor for UC Santa Cruz."},
-            {"role": "user", "content": prompt},
-        ],
+        messages=messages,
     )
     
-    return response.choices[0].message.content
+    return response
 
 def is_recommendation_request(message):
     """Determine if a message is asking for course recommendations."""
@@ -421,6 +544,231 @@ def is_recommendation_request(message):
     message_lower = message.lower()
     return any(keyword in message_lower for keyword in recommendation_keywords)
 
+def format_course_info(course_info):
+    """Shape a classInfo document into the recommended-course payload."""
+    return {
+        "Class Code": course_info.get("Class Code", ""),
+        "Class Name": course_info.get("Class Name", ""),
+        "Class Type": course_info.get("Class Type", "Undergraduate"),
+        "Credits": course_info.get("Credits", ""),
+        "Days & Times": course_info.get("Days & Times", ""),
+        "Room": course_info.get("Room", ""),
+        "Instructors": course_info.get("Instructors", ""),
+        "Description": course_info.get("Description", "No description available."),
+        "Prereqs": course_info.get("Prereqs", "")
+    }
+
+def _lookup_course_details(course_codes):
+    """Dedupe codes (keeping first-mention order) and answer them from the catalog snapshot."""
+    ordered_codes = list(dict.fromkeys(normalize_code(code) for code in course_codes if code))
+    catalog = get_catalog(client)
+    found = {code: catalog.get(code) for code in ordered_codes}
+    missing = [code for code, doc in found.items() if doc is None]
+    return ordered_codes, found, missing
+
+def _merge_course_details(ordered_codes, found, fetched_docs):
+    for doc in fetched_docs:
+        code = normalize_code(doc.get("Class Code"))
+        if found.get(code) is None:
+            found[code] = doc
+    return [format_course_info(found[code]) for code in ordered_codes if found.get(code)]
+
+def resolve_course_details(course_codes):
+    """Resolve course codes to formatted course info in one round trip.
+
+    Codes are deduplicated while keeping the order they were first mentioned.
+    The catalog snapshot answers most of them; any misses (e.g. classes added
+    since the last refresh) are fetched together with a single $in query.
+    """
+    ordered_codes, found, missing = _lookup_course_details(course_codes)
+    fetched_docs = []
+    if missing:
+        fetched_docs = client["course"]["classInfo"].find({"Class Code": {"$in": missing}}, {"_id": 0})
+    return _merge_course_details(ordered_codes, found, fetched_docs)
+
+async def resolve_course_details_async(course_codes):
+    """Async variant of resolve_course_details for the upload pipeline."""
+    ordered_codes, found, missing = _lookup_course_details(course_codes)
+    fetched_docs = []
+    if missing:
+        fetched_docs = await find_async("course", "classInfo", {"Class Code": {"$in": missing}}, {"_id": 0})
+    return _merge_course_details(ordered_codes, found, fetched_docs)
+
+def parse_transcript(source):
+    """Extract and parse a transcript PDF into (cleaned_lines, courses_by_quarter)."""
+    text = extract_text_from_pdf(source)
+    cleaned_lines = clean_text(text)
+    return cleaned_lines, parse_courses(cleaned_lines)
+
+async def process_upload_async(source, progress=None, session_id=DEFAULT_SESSION_ID):
+    """Run the upload pipeline on the shared event loop, overlapping independent stages.
+
+    The student's info is stored in `session_id`'s session.
+    `progress(stage, fraction)` is called as each stage starts, if given.
+    Returns (body, status) for jsonify.
+    """
+    runtime = get_async_runtime()
+    report = progress or (lambda stage, fraction: None)
+    
+    report("parsing", 0.1)
+    
+    # Warm the catalog snapshot while the PDF is being read
+    catalog_task = asyncio.ensure_future(asyncio.to_thread(get_catalog, client))
+    
+    # Repeat uploads of the same PDF skip parsing; whole results are reused further down
+    transcript_cache = get_transcript_cache()
+    data = await asyncio.to_thread(read_pdf_bytes, source)
+    digest = transcript_digest(data)
+    catalog = await catalog_task
+    
+    parsed = transcript_cache.get_parsed(digest)
+    if parsed is None:
+        cleaned_lines, courses_by_quarter = await asyncio.to_thread(parse_transcript, data)
+        
+        # Extract the major from the cleaned lines
+        major = extract_major(cleaned_lines)
+        major_info = extract_major_and_type(major)
+        student_number, student_name = extract_student_identity(cleaned_lines)
+        parsed = {
+            "courses_by_quarter": courses_to_dicts(courses_by_quarter),
+            "degree": major,
+            "major": major_info["major"],
+            "type": major_info["type"],
+            # Year of admission
+            "admission_year": list(courses_by_quarter.keys())[0].split(" ")[0],
+            "student_number": student_number,
+            "student_name": student_name,
+        }
+        transcript_cache.set_parsed(digest, parsed)
+    
+    courses_by_quarter = parsed["courses_by_quarter"]
+    major = parsed["degree"]
+    major_name = parsed["major"]
+    major_type = parsed["type"]
+    year_of_admission = parsed["admission_year"]
+    
+    student_history = []
+    for quarter, courses in courses_by_quarter.items():
+        for course in courses:
+            student_history.append(course['course_code'])
+    
+    query = {"major": major_name, "admission_year": year_of_admission, "type": major_type}
+    
+    async def find_eligible_courses():
+        return await asyncio.to_thread(lambda: set(catalog.prerequisite_engine().eligible(student_history)))
+    
+    # The curriculum read and the eligibility pass depend only on major and history
+    report("curriculum", 0.3)
+    curriculum, eligible_courses, session = await asyncio.gather(
+        find_one_async("university", "majors", query),
+        find_eligible_courses(),
+        asyncio.to_thread(sessions.get, session_id)
+    )
+    
+    if not curriculum:
+        return {"success": False, "error": f"No curriculum found for {major} and year {year_of_admission}"}, 404
+    
+    # The result depends on the catalog, the curriculum and the prompt's other inputs (full history and
+    # preferences), so a repeat upload is only served from the cache when none of them changed
+    fingerprint = prompt_fingerprint(student_history, session["student_preferences"])
+    result_inputs = f"{catalog.version}:{curriculum_fingerprint(curriculum)}:{fingerprint}"
+    cached = transcript_cache.get_result(digest, result_inputs)
+    if cached is not None:
+        await asyncio.to_thread(sessions.update, session_id, student_info=cached["student_info"])
+        return {"success": True, "data": cached["data"]}, 200
+    
+    # Diff against this student's previous upload; only touched requirement groups are re-evaluated.
+    # Compiling the curriculum index is CPU-bound, so it runs off the event loop.
+    # The transcript's student number when it has one, else a digest of name, program and full course record.
+    # It keys both the planner state and the stored recommendations, so classmates never share either.
+    student_id = student_key(
+        parsed.get("student_number"), parsed.get("student_name"),
+        (major_name, major_type, year_of_admission), courses_by_quarter,
+    )
+    planner = get_planner()
+    
+    def plan_progress():
+        plan_state, previous_plan, curriculum_index = planner.progress(student_id, curriculum, student_history)
+        return (plan_state, previous_plan, *curriculum_index.summarize(plan_state.required_done, plan_state.upper_taken))
+    
+    plan_state, previous_plan, remaining_required_courses, remaining_upper_div_courses, upper_div_electives_taken = await asyncio.to_thread(plan_progress)
+    
+    # Keep only catalog courses the student already has the prerequisites for
+    common_courses = [course for course in remaining_upper_div_courses if normalize_code(course) in eligible_courses]
+    
+    # Preferences and courses outside the curriculum also shape the prompt, so they gate reuse too
+    course_info_list = planner.reusable_recommendations(previous_plan, plan_state, common_courses, catalog.version, fingerprint)
+    if course_info_list is None:
+        # Generate the schedule
+        report("recommending", 0.5)
+        # Ranking (including the prerequisite unlock counts) and packing are CPU-bound
+        messages = await asyncio.to_thread(build_schedule_messages, courses=common_courses, student_history=student_history, required_courses=remaining_required_courses, upper_electives_taken=upper_div_electives_taken, upper_electives_needed=remaining_upper_div_courses, preferences=session["student_preferences"])
+        schedule = await cached_chat_completion_async(runtime.openai, model="chatgpt-4o-latest", messages=messages)
+        course_codes = re.findall(r'[A-Z]{2,4} \d{2,3}[A-Z]*', schedule)
+        
+        report("resolving", 0.9)
+        course_info_list = await resolve_course_details_async(course_codes)
+    planner.record(student_id, plan_state, common_courses, catalog.version, fingerprint, course_info_list)
+    
+    # Store recommended courses with student identifier, off the response path
+    runtime.fire_and_forget(update_one_async(
+        "course",
+        RECOMMENDED_COURSES,
+        {"student_id": student_id},
+        {"$set": {
+            "student_id": student_id,
+            "major": major_name,
+            "type": major_type,
+            "recommended_courses": course_info_list,
+            "last_updated": datetime.datetime.now(datetime.timezone.utc)
+        }},
+        upsert=True
+    ), "recommended courses upsert")
+    
+    student_info = {
+        "major": major_name,
+        "type": major_type,
+        "student_history": student_history,
+        "remaining_required_courses": remaining_required_courses,
+        "remaining_upper_div_courses": remaining_upper_div_courses,
+        "student_id": student_id
+    }
+    await asyncio.to_thread(sessions.update, session_id, student_info=student_info)
+    
+    result = {
+        "major": major_name,
+        "type": major_type,
+        "courses_by_quarter": courses_by_quarter,
+        "upper_div_electives_taken": upper_div_electives_taken,
+        "remaining_upper_div_courses": remaining_upper_div_courses,
+        "remaining_required_courses": remaining_required_courses,
+        "recommended_courses": course_info_list
+    }
+    transcript_cache.set_result(digest, result_inputs, {"data": result, "student_info": student_info})
+    
+    return {"success": True, "data": result}, 200
+
+def spool_upload(file):
+    """Copy an uploaded file into a private buffer.
+
+    The buffer lives in memory and only spills to an unnamed temp file (unique
+    per upload, removed on close) once it grows past UPLOAD_SPOOL_BYTES.
+    """
+    upload = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES, dir=app.config["UPLOAD_FOLDER"])
+    shutil.copyfileobj(file.stream, upload)
+    upload.seek(0)
+    return upload
+
+def process_upload_job(payload, progress):
+    """Job handler: run the upload pipeline for a transcript's PDF bytes."""
+    body, status = get_async_runtime().run(process_upload_async(payload["pdf"], progress, payload["session_id"]))
+    if status != 200:
+        raise ValueError(body.get("error", f"Upload failed with status {status}"))
+    return body["data"]
+
+# Job records live in MongoDB when it is configured, so any worker can answer /jobs/<id>
+upload_jobs = JobManager(process_upload_job, store=create_job_store(client))
+
 @app.route('/upload', methods=['POST'])
 def upload_pdf():
     """Handle file upload and processing."""
@@ -434,141 +782,50 @@ def upload_pdf():
     if not allowed_file(file.filename):
         return jsonify({"success": False, "error": "Invalid file type. Only PDFs allowed"}), 400
 
-    file_path = os.path.join(app.config["UPLOAD_FOLDER"], file.filename)
-    file.save(file_path)
+    upload = spool_upload(file)
+    session_id = current_session_id()
+
+    if wants_job():
+        # Jobs may be stored outside this process, so they carry the PDF's bytes rather than the buffer
+        try:
+            pdf = read_pdf_bytes(upload)
+            job_id = upload_jobs.submit({"pdf": pdf, "session_id": session_id})
+        except PDFLimitError as e:
+            return jsonify({"success": False, "error": str(e)}), 413
+        except JobQueueFull as e:
+            return jsonify({"success": False, "error": str(e)}), 503
+        finally:
+            upload.close()
+        return jsonify({"success": True, "job_id": job_id, "status_url": f"/jobs/{job_id}", "session_id": session_id}), 202
 
     try:
-        text = extract_text_from_pdf(file_path)
-        cleaned_lines = clean_text(text)
-        courses_by_quarter = parse_courses(cleaned_lines)
-        major = extract_major(cleaned_lines)
-
-        student_history = []
-        for quarter, courses in courses_by_quarter.items():
-            for course in courses:
-                student_history.append(course['course_code'])
-        
-
-        global current_student_history
-        current_student_history = student_history
-        
-        # Year of admission
-        year_of_admission = list(courses_by_quarter.keys())[0].split(" ")[0]
-
-        # Extract the major from the cleaned lines
-        major = extract_major(cleaned_lines)
-        major_info = extract_major_and_type(major)
-        major_name = major_info["major"]
-        major_type = major_info["type"]
-
-        db = client["university"]  # Name of your MongoDB database
-        collection = db['majors']
-        query = {"major": major_name, "admission_year": year_of_admission, "type": major_type}
-
-        db2 = client["course"]
-        collection2 = db2['classInfo']
-        class_codes = collection2.find({}, {"Class Code": 1, "_id": 0})
-        class_code_list = [class_code.get("Class Code") for class_code in class_codes]
-        
-        curriculum = collection.find_one(query)
-        
-        remaining_upper_div_courses = []
-        remaining_required_courses = []
-        upper_div_electives_taken = 0
-
-        if curriculum:
-            required_courses = curriculum.get("required_courses", [])
-            for course_group in required_courses:
-                if not any(course in student_history for course in course_group):
-                    remaining_required_courses.append(course_group)
-            upper_div_categories = curriculum.get("upper_div_categories", [])
-            for category_name, courses in upper_div_categories.items():
-                for course_group in courses:
-                    for course in course_group:
-                        if course in student_history:
-                            upper_div_electives_taken += 1
-                        if course not in student_history:
-                            remaining_upper_div_courses.append(course)
-        else:
-            return jsonify({"success": False, "error": f"No curriculum found for {major} and year {year_of_admission}"}), 404
-        
-        common_courses = [course for course in remaining_upper_div_courses if course in class_code_list]
-        
-        prerequisites_cursor = collection2.find({"Class Code": {"$in": common_courses}}, {"Class Code": 1, "Prereqs": 1, "_id": 0})
-        prerequisites = {doc["Class Code"]: doc.get("Prereqs", "None") for doc in prerequisites_cursor}
-
-        # Generate the schedule
-        schedule = generate_schedule(courses=common_courses, student_history=student_history, required_courses=remaining_required_courses, upper_electives_taken=upper_div_electives_taken, upper_electives_needed=remaining_upper_div_courses, prerequisites=prerequisites)
-        course_codes = re.findall(r'[A-Z]{2,4} \d{2,3}[A-Z]*', schedule)
-        
-        # Fetch course information from MongoDB
-        course_info_list = []
-        for course_code in course_codes:
-            course_info = collection2.find_one({"Class Code": course_code}, {"_id": 0})
-            if course_info:
-                formatted_course = {
-                    "Class Code": course_info.get("Class Code", ""),
-                    "Class Name": course_info.get("Class Name", ""),
-                    "Class Type": course_info.get("Class Type", "Undergraduate"),
-                    "Credits": course_info.get("Credits", ""),
-                    "Days & Times": course_info.get("Days & Times", ""),
-                    "Room": course_info.get("Room", ""),
-                    "Instructors": course_info.get("Instructors", ""),
-                    "Description": course_info.get("Description", "No description available."),
-                    "Prereqs": course_info.get("Prereqs", "")
-                }
-                course_info_list.append(formatted_course)
-        
-        # Save recommended courses to dedicated collection
-        recommended_db = client["course"]
-        recommended_collection = recommended_db[RECOMMENDED_COURSES]
-        
-        # Create a unique student identifier (using a hash of their history or some other identifier)
-        student_id = hash(str(student_history))
-        
-        # Store recommended courses with student identifier
-        recommended_collection.update_one(
-            {"student_id": student_id},
-            {"$set": {
-                "student_id": student_id,
-                "major": major_name,
-                "type": major_type,
-                "recommended_courses": course_info_list,
-                "last_updated": os.popen('date "+%Y-%m-%d %H:%M:%S"').read().strip()
-            }},
-            upsert=True
-        )
-
-        global student_info
-        student_info = {
-            "major": major_name,
-            "type": major_type,
-            "student_history": student_history,
-            "remaining_required_courses": remaining_required_courses,
-            "remaining_upper_div_courses": remaining_upper_div_courses,
-            "student_id": student_id
-        }
-
-        return jsonify({
-            "success": True,
-            "data": {
-                "major": major_name,
-                "type": major_type,
-                "courses_by_quarter": courses_by_quarter,
-                "upper_div_electives_taken": upper_div_electives_taken,
-                "remaining_upper_div_courses": remaining_upper_div_courses,
-                "remaining_required_courses": remaining_required_courses,
-                "recommended_courses": course_info_list
-            }
-        }), 200
+        body, status = get_async_runtime().run(process_upload_async(upload, session_id=session_id))
+        return jsonify({**body, "session_id": session_id}), status
+    except PDFLimitError as e:
+        return jsonify({"success": False, "error": str(e)}), 413
+    except PDFTimeoutError as e:
+        return jsonify({"success": False, "error": str(e)}), 504
     except Exception as e:
         print(f"Error processing file: {e}", file=sys.stderr)
         return jsonify({"success": False, "error": str(e)}), 500
     finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-student_info = {
+        upload.close()
+
+@app.route('/jobs/stats', methods=['GET'])
+def jobs_stats():
+    """Background job counts by status."""
+    return jsonify(upload_jobs.stats())
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Poll a background upload job for its progress and, once done, its result."""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "error": "Unknown or expired job"}), 404
+    return jsonify({"success": True, **job})
+
+# Session state for callers that have not uploaded a transcript or stated preferences yet
+DEFAULT_STUDENT_INFO = {
     "major": None,
     "type": None,
     "student_history": [],
@@ -577,7 +834,7 @@ student_info = {
     "student_id": None
 }
 
-student_preferences = {
+DEFAULT_PREFERENCES = {
     "preferredTimeOfDay": "any",
     "workloadPreference": "balanced",
     "interestAreas": [],
@@ -587,6 +844,12 @@ student_preferences = {
     "preferConsecutiveClasses": False
 }
 
+# Per-session student info and preferences, shared across workers through MongoDB
+sessions = create_session_store(client, {
+    "student_info": DEFAULT_STUDENT_INFO,
+    "student_preferences": DEFAULT_PREFERENCES,
+})
+
 def is_schedule_request(message):
     """Determine if a message is asking for schedule recommendations."""
     schedule_keywords = [
@@ -604,7 +867,14 @@ def is_schedule_request(message):
     return any(keyword in message_lower for keyword in schedule_keywords)
 
 def extract_schedule_preferences(message):
-    """Extract schedule preferences from user message using OpenAI."""
+    """Extract schedule preferences from user message.
+
+    Returns (preferences, path) where path is "rules" or "llm".
+    """
+    extracted_preferences = extract_with_rules(message, schedule_preferences_from_signals)
+    if extracted_preferences is not None:
+        return extracted_preferences, "rules"
+    
     extraction_prompt = f"""
     Extract schedule preferences from this message:
     "{message}"
@@ -626,7 +896,8 @@ def extract_schedule_preferences(message):
     Only include the JSON in your response, no other text.
     """
     
-    response = openai_client.chat.completions.create(
+    response = cached_chat_completion(
+        openai_client,
         model="chatgpt-4o-latest",
         messages=[
             {"role": "system", "content": "You are a preference extraction system."},
@@ -635,14 +906,22 @@ def extract_schedule_preferences(message):
     )
     
     try:
-        extracted_preferences = json.loads(response.choices[0].message.content)
-        return extracted_preferences
+        extracted_preferences = json.loads(response)
+        return extracted_preferences, "llm"
     except Exception as e:
         print(f"Error parsing schedule preferences JSON: {e}")
-        return {}
+        return {}, "llm"
+
+def extract_and_store_preferences(message, session_id=DEFAULT_SESSION_ID):
+    """Extract student preferences from message and store them in the session.
 
-def extract_and_store_preferences(message):
-    """Extract and store student preferences from message."""
+    Returns (preferences, path) where path is "rules" or "llm".
+    """
+    extracted_preferences = extract_with_rules(message, student_preferences_from_signals)
+    if extracted_preferences is not None:
+        sessions.update(session_id, student_preferences=extracted_preferences)
+        return extracted_preferences, "rules"
+    
     extraction_prompt = f"""
     Extract the student's course preferences from this message:
     "{message}"
@@ -659,7 +938,8 @@ def extract_and_store_preferences(message):
     Only include the JSON in your response, no other text.
     """
     
-    response = openai_client.chat.completions.create(
+    response = cached_chat_completion(
+        openai_client,
         model="chatgpt-4o-latest",
         messages=[
             {"role": "system", "content": "You are a preference extraction system."},
@@ -668,63 +948,39 @@ def extract_and_store_preferences(message):
     )
     
     try:
-        extracted_preferences = json.loads(response.choices[0].message.content)
+        extracted_preferences = json.loads(response)
         
-        global student_preferences
-        student_preferences = extracted_preferences
+        sessions.update(session_id, student_preferences=extracted_preferences)
         
-        return extracted_preferences
+        return extracted_preferences, "llm"
     except Exception as e:
         print(f"Error parsing preferences: {e}")
-        return {}
+        return {}, "llm"
 
-def generate_personalized_schedule(preferences, student_history, required_courses, major, student_id=None):
-    """Generate a personalized schedule based on student preferences."""
-    db = client["course"]
-    collection = db['classInfo']
-    
-    query = {}
-    
-    # Add filters based on preferences
-    if preferences.get('preferredSubjects'):
-        subject_patterns = [f"^{subj}" for subj in preferences['preferredSubjects']]
-        query['Class Code'] = {'$regex': {'$in': subject_patterns}}
-    
-    if preferences.get('avoidSubjects'):
-        avoid_patterns = [f"^{subj}" for subj in preferences['avoidSubjects']]
-        if 'Class Code' in query:
-            query['$and'] = [
-                {'Class Code': query['Class Code']},
-                {'Class Code': {'$not': {'$in': avoid_patterns}}}
-            ]
-            del query['Class Code']
-        else:
-            query['Class Code'] = {'$not': {'$in': avoid_patterns}}
-    
-    time_query = {}
-    if preferences.get('earliestStartTime'):
-        # This would need more sophisticated time comparison logic
-        pass
-    
-    if preferences.get('latestEndTime'):
-        # This would need more sophisticated time comparison logic
-        pass
-    
-    if preferences.get('preferredDaysOff'):
-        days_to_avoid = preferences['preferredDaysOff']
-        day_patterns = []
-        for day in days_to_avoid:
-            day_patterns.append({'Days & Times': {'$not': {'$regex': day}}})
-        
-        if day_patterns:
-            if '$and' not in query:
-                query['$and'] = []
-            query['$and'].extend(day_patterns)
-    
-    # Get available courses
-    available_courses = list(collection.find(query, {'_id': 0}))
-    
-    # Filter out courses student
+def generate_personalized_schedule(preferences, student_history, required_courses, major, student_id=None, stream=False, stored_preferences=None):
+    """Generate a personalized schedule based on student preferences.
+
+    `stored_preferences` are the session's saved preferences; `preferences` from the message override them.
+
+    With stream=True, returns an iterator of text chunks instead of a string.
+    """
+    catalog = get_catalog(client)
+    
+    preferred_subjects = preferences.get('preferredSubjects') or []
+    avoid_subjects = preferences.get('avoidSubjects') or []
+    days_off = parse_days(preferences.get('preferredDaysOff'))
+    
+    # Get available courses from the catalog snapshot
+    available_courses = []
+    for course in catalog.documents():
+        class_code = course.get('Class Code', '')
+        if preferred_subjects and not any(class_code.startswith(subj) for subj in preferred_subjects):
+            continue
+        if any(class_code.startswith(subj) for subj in avoid_subjects):
+            continue
+        if any(meeting.days & days_off for meeting in parse_meetings(course.get('Days & Times'))):
+            continue
+        available_courses.append(course)
     
     # Filter out courses student has already taken
     available_courses = [course for course in available_courses 
@@ -744,18 +1000,45 @@ def generate_personalized_schedule(preferences, student_history, required_course
         required_available = [course for course in available_courses 
                               if course.get('Class Code') in flattened_required]
     
-    # Generate schedule using OpenAI
-    course_list = "\n".join([
-        f"- {course.get('Class Code', 'Unknown')}: {course.get('Class Name', 'Unknown')} "
-        f"({course.get('Credits', 'Unknown')} units) - {course.get('Days & Times', 'Unknown')}"
-        for course in available_courses[:30]  # Limit to 30 to not overload the prompt
-    ])
+    # Search conflict-free section combinations locally; times, days off and
+    # unit targets are enforced by the solver, and ranking uses the stored preferences.
+    ranking_preferences = {**(stored_preferences or DEFAULT_PREFERENCES), **{k: v for k, v in preferences.items() if v is not None}}
+    eligible_courses = set(catalog.prerequisite_engine().eligible(student_history))
+    
+    # Rank every available course once (required, eligible, interests, unlocks); the solver
+    # searches the best MAX_SCHEDULE_CANDIDATES of them and the LLM fallback packs the same order
+    required_set = {normalize_code(code) for code in flattened_required} if required_available else set()
+    ranked = rank_courses(
+        [document_course_row(course) for course in available_courses],
+        required_codes=required_set,
+        eligible_codes=eligible_courses,
+        preferences=ranking_preferences,
+        unlock_counts=catalog.prerequisite_engine().unlock_counts(),
+        max_candidates=len(available_courses)
+    )
+    candidate_codes = [
+        row["code"] for row in ranked if row["code"] in required_set or row["code"] in eligible_courses
+    ][:MAX_SCHEDULE_CANDIDATES]
+    schedules = solve_schedules(
+        [(code, catalog.sections(code)) for code in candidate_codes],
+        ranking_preferences,
+        required_codes=flattened_required,
+        top_k=3
+    )
+    
+    if schedules:
+        schedule_text = f"Here are {len(schedules)} conflict-free schedule option(s) for your {major} major:\n\n" + "\n\n".join(
+            f"Option {index}:\n{format_schedule(schedule)}" for index, schedule in enumerate(schedules, start=1)
+        )
+        return iter([schedule_text]) if stream else schedule_text
     
-    required_list = "\n".join([
-        f"- {course.get('Class Code', 'Unknown')}: {course.get('Class Name', 'Unknown')} "
-        f"({course.get('Credits', 'Unknown')} units) - {course.get('Days & Times', 'Unknown')}"
-        for course in required_available
-    ]) if required_available else "No required courses available this quarter."
+    # Fall back to OpenAI when no feasible combination was found, sending only
+    # the best-ranked candidates that fit the prompt budget
+    course_table, rows_included, _ = pack_course_table(ranked[:PROMPT_MAX_CANDIDATES])
+    
+    required_list = ", ".join(
+        dict.fromkeys(course.get('Class Code', 'Unknown') for course in required_available)
+    ) if required_available else "No required courses available this quarter."
     
     target_units = preferences.get('totalUnits', 15)
     
@@ -769,8 +1052,8 @@ def generate_personalized_schedule(preferences, student_history, required_course
     Required courses available this quarter:
     {required_list}
     
-    Other available courses (sample):
-    {course_list}
+    Available courses, most relevant first:
+    {course_table}
     
     Create a balanced schedule with approximately {target_units} units that:
     1. Prioritizes required courses for their major if requested
@@ -784,15 +1067,18 @@ def generate_personalized_schedule(preferences, student_history, required_course
     Also provide a brief explanation of why this schedule would work well for them.
     """
     
-    response = openai_client.chat.completions.create(
+    messages = build_messages("personalized_schedule", "You are an expert academic scheduler.", schedule_prompt, rows_included, len(available_courses))
+    
+    if stream:
+        return stream_chat_completion(openai_client, model="chatgpt-4o-latest", messages=messages)
+    
+    response = cached_chat_completion(
+        openai_client,
         model="chatgpt-4o-latest",
-        messages=[
-            {"role": "system", "content": "You are an expert academic scheduler."},
-            {"role": "user", "content": schedule_prompt},
-        ],
+        messages=messages,
     )
     
-    return response.choices[0].message.content
+    return response
 
 
 @app.route('/refine_schedule', methods=['POST'])
@@ -818,16 +1104,22 @@ def refine_schedule():
     Provide the revised schedule and explain the changes made.
     """
     
-    response = openai_client.chat.completions.create(
+    messages = [
+        {"role": "system", "content": "You are an expert academic scheduler."},
+        {"role": "user", "content": refine_prompt},
+    ]
+    
+    if wants_stream(data):
+        return stream_events(stream_chat_completion(openai_client, model="chatgpt-4o-latest", messages=messages))
+    
+    response = cached_chat_completion(
+        openai_client,
         model="chatgpt-4o-latest",
-        messages=[
-            {"role": "system", "content": "You are an expert academic scheduler."},
-            {"role": "user", "content": refine_prompt},
-        ],
+        messages=messages,
     )
     
     return jsonify({
-        "response": response.choices[0].message.content
+        "response": response
     })
 
 @app.route('/compare_schedules', methods=['POST'])
@@ -855,17 +1147,23 @@ def compare_schedules():
     Also identify pros and cons of each option.
     """
     
-    response = openai_client.chat.completions.create(
+    messages = [
+        {"role": "system", "content": "You are an expert academic scheduler."},
+        {"role": "user", "content": comparison_prompt},
+    ]
+    
+    if wants_stream(data):
+        return stream_events(stream_chat_completion(openai_client, model="chatgpt-4o-latest", messages=messages))
+    
+    response = cached_chat_completion(
+        openai_client,
         model="chatgpt-4o-latest",
-        messages=[
-            {"role": "system", "content": "You are an expert academic scheduler."},
-            {"role": "user", "content": comparison_prompt},
-        ],
+        messages=messages,
     )
     
     return jsonify({
         "success": True,
-        "comparison": response.choices[0].message.content
+        "comparison": response
     })
 
 @app.route('/chat', methods=['POST'])
@@ -873,34 +1171,49 @@ def chat():
     """Handle chat messages and provide schedule recommendations."""
     data = request.json
     message = data.get('message', '')
+    session_id = current_session_id()
+    session = sessions.get(session_id)
+    student_info = session["student_info"]
     
     # Check if this is a schedule recommendation request
     if is_schedule_request(message):
-        preferences = extract_schedule_preferences(message)
+        preferences, extraction_path = extract_schedule_preferences(message)
         
         schedule_response = generate_personalized_schedule(
             preferences, 
             student_info.get("student_history", []),
             student_info.get("remaining_required_courses", []),
-            student_info.get("major", "Unknown")
+            student_info.get("major", "Unknown"),
+            stream=wants_stream(data),
+            stored_preferences=session["student_preferences"]
         )
         
+        if wants_stream(data):
+            return stream_events(schedule_response, ("extraction", {"extraction_path": extraction_path}))
+        
         return jsonify({
-            "response": schedule_response
+            "response": schedule_response,
+            "extraction_path": extraction_path
         })
     
     
     elif any(keyword in message.lower() for keyword in ["prefer", "like", "enjoy", "interested in"]):
         
-        extracted_preferences = extract_and_store_preferences(message)
+        extracted_preferences, extraction_path = extract_and_store_preferences(message, session_id)
+        
+        preferences_response = f"I've noted your preferences:\n" + \
+                               f"- Time of day: {extracted_preferences.get('preferredTimeOfDay', 'Not specified')}\n" + \
+                               f"- Days: {', '.join(extracted_preferences.get('preferredDays', ['Not specified']))}\n" + \
+                               f"- Workload: {extracted_preferences.get('workloadPreference', 'Not specified')}\n" + \
+                               f"- Interests: {', '.join(extracted_preferences.get('interestAreas', []))}\n\n" + \
+                               f"I'll adjust my schedule recommendations accordingly."
+        
+        if wants_stream(data):
+            return stream_events(iter([preferences_response]), ("extraction", {"extraction_path": extraction_path}))
         
         return jsonify({
-            "response": f"I've noted your preferences:\n" +
-                        f"- Time of day: {extracted_preferences.get('preferredTimeOfDay', 'Not specified')}\n" +
-                        f"- Days: {', '.join(extracted_preferences.get('preferredDays', ['Not specified']))}\n" +
-                        f"- Workload: {extracted_preferences.get('workloadPreference', 'Not specified')}\n" +
-                        f"- Interests: {', '.join(extracted_preferences.get('interestAreas', []))}\n\n" +
-                        f"I'll adjust my schedule recommendations accordingly."
+            "response": preferences_response,
+            "extraction_path": extraction_path
         })
     
     
@@ -916,18 +1229,89 @@ def chat():
     Provide a helpful, concise response about course scheduling, requirements, or general academic advice.
     """
     
-    response = openai_client.chat.completions.create(
+    messages = [
+        {"role": "system", "content": "You are a helpful academic advisor for UC Santa Cruz."},
+        {"role": "user", "content": chat_prompt},
+    ]
+    
+    if wants_stream(data):
+        return stream_events(stream_chat_completion(openai_client, model="chatgpt-4o-latest", messages=messages))
+    
+    response = cached_chat_completion(
+        openai_client,
         model="chatgpt-4o-latest",
-        messages=[
-            {"role": "system", "content": "You are a helpful academic advisor for UC Santa Cruz."},
-            {"role": "user", "content": chat_prompt},
-        ],
+        messages=messages,
     )
     
     return jsonify({
-        "response": response.choices[0].message.content
+        "response": response
     })
 
+@app.route('/degree_progress', methods=['POST'])
+def degree_progress():
+    """What-if degree progress for one or more course histories against one major.
+
+    Body: {"major", "admission_year", "type", "histories": [[course codes], ...]}
+    """
+    data = request.json or {}
+    histories = data.get('histories') or []
+    if not isinstance(histories, list) or not all(isinstance(history, list) for history in histories):
+        return jsonify({"success": False, "error": "histories must be a list of course code lists"}), 400
+    
+    query = {"major": data.get('major'), "admission_year": str(data.get('admission_year')), "type": data.get('type')}
+    curriculum = client["university"]["majors"].find_one(query)
+    if not curriculum:
+        return jsonify({"success": False, "error": f"No curriculum found for {query['major']} and year {query['admission_year']}"}), 404
+    
+    curriculum_index = get_curriculum_index(curriculum)
+    results = []
+    for history in histories:
+        required_done, upper_taken = curriculum_index.progress(history)
+        remaining_required_courses, remaining_upper_div_courses, upper_div_electives_taken = curriculum_index.summarize(required_done, upper_taken)
+        results.append({
+            "remaining_required_courses": remaining_required_courses,
+            "remaining_upper_div_courses": remaining_upper_div_courses,
+            "upper_div_electives_taken": upper_div_electives_taken,
+            "categories": curriculum_index.category_progress(upper_taken)
+        })
+    return jsonify({"success": True, "results": results})
+
+@app.route('/transcript_cache/stats', methods=['GET'])
+def transcript_cache_stats():
+    """Report uploaded transcript cache hit/miss metrics."""
+    return jsonify(get_transcript_cache().stats())
+
+@app.route('/planner/stats', methods=['GET'])
+def planner_stats():
+    """Report incremental planner state hit/miss metrics."""
+    return jsonify(get_planner().stats())
+
+@app.route('/prompt/stats', methods=['GET'])
+def prompt_stats():
+    """Report prompt token counts by prompt type."""
+    return jsonify(get_prompt_stats().stats())
+
+@app.route('/session/stats', methods=['GET'])
+def session_stats():
+    """Report session store local-tier hit/miss metrics."""
+    return jsonify(sessions.stats())
+
+@app.route('/clients/stats', methods=['GET'])
+def clients_stats():
+    """Report MongoDB connection pool and OpenAI request counters."""
+    return jsonify(pool_stats())
+
+@app.route('/llm_gateway/stats', methods=['GET'])
+def llm_gateway_stats():
+    """Report LLM gateway concurrency, coalescing and retry counters."""
+    return jsonify(get_llm_limiter().stats())
+
+@app.route('/llm_cache/stats', methods=['GET'])
+def llm_cache_stats():
+    """Report LLM response cache hit/miss metrics."""
+    cache = get_llm_cache()
+    return jsonify(cache.stats() if cache is not None else {"enabled": False})
+
 @app.route('/specific_recommendations', methods=['POST'])
 def specific_recommendations():
     """Endpoint for getting recommendations with specific criteria."""
@@ -937,14 +1321,25 @@ def specific_recommendations():
     if not criteria:
         return jsonify({"success": False, "error": "No criteria provided"}), 400
     
-    
-    courses = query_courses_by_criteria(criteria)
-    
+    student_info = sessions.get(current_session_id())["student_info"]
+    courses = query_courses_by_criteria(criteria, student_info)
+    
+    if wants_stream(data):
+        # The matched courses are known before the model starts writing; send them first.
+        recommendation_chunks = format_course_recommendations(
+            courses, 
+            criteria, 
+            student_info.get("student_history"),
+            stream=True,
+            student_info=student_info
+        )
+        return stream_events(recommendation_chunks, ("courses", {"success": True, "courses": courses}))
     
     recommendation_response = format_course_recommendations(
         courses, 
         criteria, 
-        student_info.get("student_history")
+        student_info.get("student_history"),
+        student_info=student_info
     )
     
     return jsonify({
@@ -0,0 +1,230 @@
+#batch_plan.py
+"""Plan a whole cohort offline: transcripts in, recommendations out as JSONL.
+
+Usage:
+    python batch_plan.py transcripts/ -o plans.jsonl
+    python batch_plan.py histories.jsonl -o plans.jsonl --workers 16 --no-schedule
+
+The input is either a directory of transcript PDFs or a JSONL file with one
+student per line: {"id", "major", "type", "admission_year", "history": [codes]}
+(or "courses_by_quarter" in the /upload response shape instead of "history").
+
+Each student runs the /upload pipeline (parse -> degree progress ->
+eligibility -> schedule) on a thread pool. All workers share one catalog
+snapshot and each curriculum is fetched and compiled once. PDF text
+extraction still fans out to the extraction process pool and LLM calls go
+through the gateway's concurrency limit. Throughput and per-stage timings are
+printed to stderr at the end.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PDFRead import (
+    client, courses_to_dicts, extract_major, extract_major_and_type, generate_schedule,
+    parse_transcript, resolve_course_details,
+)
+from catalog import get_catalog, normalize_code
+from curriculum_index import get_curriculum_index
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "8"))
+
+STAGES = ("parse", "degree_progress", "eligibility", "schedule")
+
+
+def transcript_inputs(path):
+    """Yield (id, loader) pairs; calling a loader returns the student's parsed transcript."""
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.lower().endswith(".pdf"):
+                yield os.path.splitext(name)[0], lambda pdf=os.path.join(path, name): load_pdf(pdf)
+        return
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                record = json.loads(line)
+                yield str(record.get("id", line_number)), lambda record=record: load_record(record)
+
+
+def load_pdf(path):
+    cleaned_lines, courses_by_quarter = parse_transcript(path)
+    major_info = extract_major_and_type(extract_major(cleaned_lines))
+    courses_by_quarter = courses_to_dicts(courses_by_quarter)
+    if not courses_by_quarter:
+        raise ValueError("No quarters found in transcript")
+    return {
+        "major": major_info["major"],
+        "type": major_info["type"],
+        "admission_year": next(iter(courses_by_quarter)).split(" ")[0],
+        "courses_by_quarter": courses_by_quarter,
+    }
+
+
+def load_record(record):
+    return {
+        "major": record.get("major"),
+        "type": record.get("type"),
+        "admission_year": str(record.get("admission_year")),
+        "courses_by_quarter": record.get("courses_by_quarter") or {"History": [
+            {"course_code": code} for code in record.get("history", [])
+        ]},
+    }
+
+
+class Curricula:
+    """university.majors documents, fetched once per program and shared by all workers."""
+
+    def __init__(self):
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def get(self, major, major_type, admission_year):
+        key = (major, major_type, admission_year)
+        with self._lock:
+            if key in self._documents:
+                return self._documents[key]
+        curriculum = client["university"]["majors"].find_one(
+            {"major": major, "admission_year": admission_year, "type": major_type}
+        )
+        with self._lock:
+            self._documents[key] = curriculum
+        return curriculum
+
+
+class StageTimings:
+    """Per-stage durations across the batch."""
+
+    def __init__(self):
+        self._durations = {stage: [] for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def record(self, timings):
+        with self._lock:
+            for stage, seconds in timings.items():
+                self._durations[stage].append(seconds)
+
+    def report(self):
+        lines = [f"{'stage':<16} {'count':>6} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for stage, durations in self._durations.items():
+            if not durations:
+                continue
+            ordered = sorted(durations)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            lines.append(
+                f"{stage:<16} {len(ordered):>6} {sum(ordered):>9.2f} {1000 * sum(ordered) / len(ordered):>9.1f} "
+                f"{1000 * p95:>9.1f} {1000 * ordered[-1]:>9.1f}"
+            )
+        return "\n".join(lines)
+
+
+def plan_student(student_id, load, catalog, curricula, schedule=True):
+    """Run one student through the pipeline; returns (result, timings)."""
+    timings = {}
+    started = time.perf_counter()
+
+    def lap(stage):
+        nonlocal started
+        now = time.perf_counter()
+        timings[stage] = now - started
+        started = now
+
+    try:
+        transcript = load()
+        student_history = [
+            course["course_code"] for courses in transcript["courses_by_quarter"].values() for course in courses
+        ]
+        lap("parse")
+
+        curriculum = curricula.get(transcript["major"], transcript["type"], transcript["admission_year"])
+        if not curriculum:
+            raise LookupError(f"No curriculum found for {transcript['major']} and year {transcript['admission_year']}")
+        curriculum_index = get_curriculum_index(curriculum)
+        remaining_required_courses, remaining_upper_div_courses, upper_div_electives_taken = \
+            curriculum_index.summarize(*curriculum_index.progress(student_history))
+        lap("degree_progress")
+
+        eligible_courses = set(catalog.prerequisite_engine().eligible(student_history))
+        common_courses = [course for course in remaining_upper_div_courses if normalize_code(course) in eligible_courses]
+        lap("eligibility")
+
+        recommended_courses = None
+        if schedule:
+            response = generate_schedule(
+                courses=common_courses, student_history=student_history, required_courses=remaining_required_courses,
+                upper_electives_taken=upper_div_electives_taken, upper_electives_needed=remaining_upper_div_courses,
+            )
+            recommended_courses = resolve_course_details(re.findall(r'[A-Z]{2,4} \d{2,3}[A-Z]*', response))
+            lap("schedule")
+
+        result = {
+            "id": student_id,
+            "success": True,
+            "major": transcript["major"],
+            "type": transcript["type"],
+            "admission_year": transcript["admission_year"],
+            "upper_div_electives_taken": upper_div_electives_taken,
+            "remaining_required_courses": remaining_required_courses,
+            "remaining_upper_div_courses": remaining_upper_div_courses,
+            "eligible_courses": common_courses,
+            "recommended_courses": recommended_courses,
+        }
+    except Exception as e:
+        print(f"Error planning {student_id}: {e}", file=sys.stderr)
+        result = {"id": student_id, "success": False, "error": str(e)}
+    result["timings_ms"] = {stage: round(1000 * seconds, 1) for stage, seconds in timings.items()}
+    return result, timings
+
+
+def run_batch(inputs, output, workers=BATCH_WORKERS, schedule=True):
+    """Plan every input on a pool of `workers` threads, writing JSONL to `output` in input order."""
+    catalog = get_catalog(client)
+    catalog.prerequisite_engine()
+    curricula = Curricula()
+    stage_timings = StageTimings()
+    summary = {"students": 0, "succeeded": 0, "failed": 0}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-plan") as pool:
+        results = pool.map(lambda item: plan_student(item[0], item[1], catalog, curricula, schedule), inputs)
+        for result, timings in results:
+            output.write(json.dumps(result, default=str) + "\n")
+            stage_timings.record(timings)
+            summary["students"] += 1
+            summary["succeeded" if result["success"] else "failed"] += 1
+    elapsed = time.perf_counter() - started
+
+    summary["seconds"] = round(elapsed, 2)
+    summary["students_per_second"] = round(summary["students"] / elapsed, 2) if elapsed else 0.0
+    return summary, stage_timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan recommendations for many students from transcripts or histories.")
+    parser.add_argument("input", help="directory of transcript PDFs or a JSONL file of histories")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--no-schedule", action="store_true", help="stop after eligibility; skip the LLM schedule stage")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        summary, stage_timings = run_batch(transcript_inputs(args.input), output, args.workers, not args.no_schedule)
+    finally:
+        if args.output:
+            output.close()
+
+    print(
+        f"{summary['students']} students ({summary['succeeded']} ok, {summary['failed']} failed) in "
+        f"{summary['seconds']}s: {summary['students_per_second']} students/s with {args.workers} workers",
+        file=sys.stderr,
+    )
+    print(stage_timings.report(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#bench_degree_progress.py
+"""Benchmark compiled curriculum bitmaps against the old nested list scans.
+
+Usage: python benchmarks/bench_degree_progress.py [--histories 1000 5000 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from curriculum_index import CurriculumIndex
+
+SUBJECTS = ['CSE', 'MATH', 'AM', 'STAT', 'ECE', 'PHYS', 'CMPM', 'LING']
+
+
+def synthetic_curriculum(rng, required_groups=24, categories=4, courses_per_category=18):
+    """A university.majors-shaped document with alternatives in some required groups."""
+    def course(low, high):
+        return f"{rng.choice(SUBJECTS)} {rng.randint(low, high)}{rng.choice(['', '', 'A', 'B', 'L'])}"
+    return {
+        "required_courses": [[course(1, 99) for _ in range(rng.choice([1, 1, 2, 3]))] for _ in range(required_groups)],
+        "upper_div_categories": {
+            f"Category {index}": [[course(100, 199)] for _ in range(courses_per_category)]
+            for index in range(categories)
+        },
+    }
+
+
+def synthetic_histories(rng, curriculum, count, size=32):
+    """Histories mixing curriculum courses with unrelated ones, as lists like the upload pipeline builds."""
+    known = sorted({course for group in curriculum["required_courses"] for course in group} | {
+        course for groups in curriculum["upper_div_categories"].values() for group in groups for course in group
+    })
+    histories = []
+    for _ in range(count):
+        taken = rng.sample(known, min(len(known), size // 2))
+        taken += [f"{rng.choice(SUBJECTS)} {rng.randint(1, 199)}X" for _ in range(size - len(taken))]
+        rng.shuffle(taken)
+        histories.append(taken)
+    return histories
+
+
+def legacy_progress(curriculum, student_history):
+    """The previous /upload loop: list membership per group and per upper-division course."""
+    remaining_upper_div_courses = []
+    remaining_required_courses = []
+    upper_div_electives_taken = 0
+    for course_group in curriculum.get("required_courses", []):
+        if not any(course in student_history for course in course_group):
+            remaining_required_courses.append(course_group)
+    for category_name, courses in curriculum.get("upper_div_categories", {}).items():
+        for course_group in courses:
+            for course in course_group:
+                if course in student_history:
+                    upper_div_electives_taken += 1
+                if course not in student_history:
+                    remaining_upper_div_courses.append(course)
+    return remaining_required_courses, remaining_upper_div_courses, upper_div_electives_taken
+
+
+def legacy_batch(curriculum, histories):
+    return [legacy_progress(curriculum, history) for history in histories]
+
+
+def indexed_batch(curriculum, histories):
+    # Compiled once per batch, as /degree_progress does per request
+    index = CurriculumIndex(curriculum)
+    return [index.summarize(*index.progress(history)) for history in histories]
+
+
+def best_of(repeat, func, *args):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--histories', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(18)
+    curriculum = synthetic_curriculum(rng)
+    print(f"{'histories':>9} {'legacy hist/s':>14} {'bitmap hist/s':>14} {'speedup':>8}")
+    for count in args.histories:
+        histories = synthetic_histories(rng, curriculum, count)
+        legacy, expected = best_of(args.repeat, legacy_batch, curriculum, histories)
+        indexed, results = best_of(args.repeat, indexed_batch, curriculum, histories)
+        assert [tuple(result) for result in results] == expected, "bitmap progress disagrees with the legacy scan"
+        print(f"{count:>9} {count / legacy:>14,.0f} {count / indexed:>14,.0f} {legacy / indexed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
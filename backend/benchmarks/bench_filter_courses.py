@@ -0,0 +1,101 @@
+#bench_filter_courses.py
+"""Benchmark filter_courses against the old row-wise apply() version.
+
+Usage: python benchmarks/bench_filter_courses.py [--sizes 10000 25000 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import pandas as pd
+
+from main import filter_courses, prepare_courses
+from prereqs import PrerequisiteEngine
+
+SUBJECTS = ['AM', 'ANTH', 'ART', 'BIOL', 'CHEM', 'CSE', 'ECE', 'ECON', 'HIS', 'LING', 'LIT', 'MATH', 'MUSC', 'PHIL',
+            'PHYS', 'POLI', 'PSYC', 'SOCY', 'STAT', 'THEA', 'WRIT', 'BIOE', 'CMPM', 'FILM', 'GAME', 'HAVC', 'OCEA', 'SPAN']
+GES = ['', 'CC', 'ER', 'IM', 'MF', 'SI', 'SR', 'TA', 'C', 'DC', 'PE-T', 'PR-E']
+
+
+def synthetic_catalog(size, seed=42):
+    rng = random.Random(seed)
+    codes = set()
+    while len(codes) < size:
+        codes.add(f"{rng.choice(SUBJECTS)} {rng.randint(1, 299)}{rng.choice(['', 'A', 'B', 'C', 'L', 'M', 'S'])}")
+    codes = sorted(codes)
+    rows = []
+    for code in codes:
+        groups = [
+            [rng.choice(codes) for _ in range(rng.randint(1, 3))]
+            for _ in range(rng.choice([0, 0, 1, 1, 2, 3]))
+        ]
+        rows.append({
+            'Course Code': f"{code} - Synthetic Course",
+            'Parsed Prerequisites': repr(groups),
+            'General education': rng.choice(GES),
+        })
+    return pd.DataFrame(rows), codes
+
+
+def legacy_filter_courses(df, student_history, required_courses, ges_taken, upper_electives_group):
+    def can_take_course(taken, prerequisites):
+        for group in prerequisites:
+            if not any(course in taken for course in group):
+                return False
+        return True
+
+    return df[
+        ~df['General education'].isin(ges_taken) &
+        (
+            df['Course Code'].str.contains(r'CSE 1[0-6][0-9]') |
+            df['Course Code'].str.split(' - ').str[0].isin([course for group in upper_electives_group for course in group]) |
+            df['Course Code'].str.split(' - ').str[0].isin([course for group in required_courses for course in group]) |
+            df.apply(lambda row: can_take_course(student_history, eval(row['Parsed Prerequisites'])), axis=1)
+        )
+    ]
+
+
+def timed(fn, *args, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 25000, 50000])
+    parser.add_argument('--history', type=int, default=40, help="number of courses in the synthetic history")
+    args = parser.parse_args()
+
+    print(f"{'courses':>8} {'legacy':>10} {'vectorized':>11} {'compile':>10} {'filter':>9} {'speedup':>8}")
+    for size in args.sizes:
+        df, codes = synthetic_catalog(size)
+        rng = random.Random(size)
+        history = rng.sample(codes, args.history)
+        required = [[code] for code in rng.sample(codes, 20)]
+        electives = [rng.sample(codes, 5) for _ in range(4)]
+        ges_taken = ['CC', 'MF']
+
+        legacy_time, legacy = timed(legacy_filter_courses, df, history, required, ges_taken, electives, repeat=1)
+        new_time, filtered = timed(filter_courses, df, history, required, ges_taken, electives)
+        # Prepared once per catalog load: categorical codes plus the compiled engine.
+        compile_time, (prepared, engine) = timed(
+            lambda frame: (prepare_courses(frame), PrerequisiteEngine.from_dataframe(frame)), df)
+        filter_time, _ = timed(filter_courses, prepared, history, required, ges_taken, electives, engine)
+        assert len(legacy) == len(filtered), (len(legacy), len(filtered))
+
+        print(f"{size:>8} {legacy_time * 1000:>8.1f}ms {new_time * 1000:>9.1f}ms {compile_time * 1000:>8.1f}ms "
+              f"{filter_time * 1000:>7.1f}ms {legacy_time / filter_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
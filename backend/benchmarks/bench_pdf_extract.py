@@ -0,0 +1,116 @@
+#bench_pdf_extract.py
+"""Benchmark PDF text extraction: in-process PyPDF2 vs the extraction pool.
+
+Builds synthetic multi-page transcripts (plain PDF text objects, no extra
+dependencies) and times both paths. Speedup depends on available cores.
+
+Usage: python benchmarks/bench_pdf_extract.py [--pages 2 8 32] [--repeat 3]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import PyPDF2
+
+import pdf_extract
+
+SUBJECTS = ['AM', 'ANTH', 'CSE', 'ECE', 'ECON', 'LING', 'MATH', 'PHYS', 'STAT', 'WRIT']
+QUARTERS = ['Fall Quarter', 'Winter Quarter', 'Spring Quarter']
+LINES_PER_PAGE = 45
+
+
+def transcript_lines(pages, seed=7):
+    rng = random.Random(seed)
+    lines = []
+    year = 2021
+    while len(lines) < pages * LINES_PER_PAGE:
+        for quarter in QUARTERS:
+            lines.append(f"{year} {quarter}")
+            for _ in range(rng.randint(3, 5)):
+                code = f"{rng.choice(SUBJECTS)} {rng.randint(1, 199)}{rng.choice(['', 'A', 'L'])}"
+                lines.append(f"{code} Synthetic Course Title {rng.choice('ABC')} 5.00 5.00 {rng.choice(['A', 'B+', 'A-', 'P'])}")
+        year += 1
+    return lines[:pages * LINES_PER_PAGE]
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def synthetic_pdf(pages, seed=7):
+    """A minimal PDF with one Helvetica text block per page."""
+    lines = transcript_lines(pages, seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in range(pages):
+        body = ["BT", "/F1 10 Tf", "12 TL", "40 760 Td"]
+        for line in lines[page * LINES_PER_PAGE:(page + 1) * LINES_PER_PAGE]:
+            body.append(f"({_escape(line)}) Tj T*")
+        body.append("ET")
+        stream = "\n".join(body).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, obj))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def extract_in_process(data):
+    """The previous implementation: every page on the calling thread."""
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return ''.join([page.extract_text() or "" for page in reader.pages])
+
+
+def best_of(repeat, func, *args, **kwargs):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[2, 8, 32])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"pool workers: {pdf_extract.PDF_WORKERS}, pages per task: {pdf_extract.PDF_PAGES_PER_TASK}, cpus: {os.cpu_count()}")
+    # Start the pool outside the timed region
+    pdf_extract.extract_text(synthetic_pdf(1))
+
+    print(f"{'pages':>6} {'bytes':>9} {'in-process':>12} {'pool':>10} {'speedup':>8}")
+    for pages in args.pages:
+        data = synthetic_pdf(pages)
+        serial, expected = best_of(args.repeat, extract_in_process, data)
+        pooled, text = best_of(args.repeat, pdf_extract.extract_text, data, max_pages=max(pages, pdf_extract.PDF_MAX_PAGES))
+        assert text == expected, "pool output differs from in-process output"
+        print(f"{pages:>6} {len(data):>9} {serial * 1000:>10.1f}ms {pooled * 1000:>8.1f}ms {serial / pooled:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#bench_transcript_parser.py
+"""Benchmark the compiled transcript tokenizer against the old substring scan.
+
+Usage: python benchmarks/bench_transcript_parser.py [--lines 10000 100000 500000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from PDFRead import COURSE_LINE, course_codes
+from transcript_parser import courses_to_dicts, parse_transcript_lines
+
+QUARTERS = ['Fall Quarter', 'Winter Quarter', 'Spring Quarter']
+TITLES = ['Intro Data Struct & Alg', 'Calculus for Science II', 'Principles Prog Languages', 'Academic Writing',
+          'Abstract Algebra', 'Intro to Linguistics', 'Computer Architecture', 'World History 1500-1900']
+GRADES = ['A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'D', 'F', 'P', 'NP', 'W', 'I']
+# Lines the parser must skip: headings, totals and plan lines between courses
+OTHER_LINES = ['Term GPA 3.500 Term Totals 15.00 15.00 52.500', 'Cum GPA 3.420 Cum Totals 90.00 90.00 307.800',
+               'Plan: Computer Science B.S.', 'Course Description Attempted Earned Grade Points']
+
+
+def synthetic_transcript(lines, seed=11):
+    rng = random.Random(seed)
+    out = []
+    year = 2000
+    while len(out) < lines:
+        for quarter in QUARTERS:
+            out.append(f"{year} {quarter}")
+            for _ in range(rng.randint(3, 5)):
+                code = f"{rng.choice(course_codes)} {rng.randint(1, 199)}{rng.choice(['', 'A', 'L'])}"
+                units = rng.choice(['5.00', '2.00', '7.00'])
+                if rng.random() < 0.15:
+                    out.append(f"{code} {rng.choice(TITLES)} {units} 0.00 0.000")
+                else:
+                    out.append(f"{code} {rng.choice(TITLES)} {units} {units} {rng.choice(GRADES)} 20.000")
+            out.append(rng.choice(OTHER_LINES))
+        year += 1
+    return out[:lines]
+
+
+def contains_any(main_string, string_array):
+    return any(substring in main_string for substring in string_array)
+
+
+def legacy_parse_courses(cleaned_lines):
+    """The previous parse_courses: a substring scan per subject per line."""
+    courses_by_quarter = {}
+    current_quarter = None
+    all_grades = {"A", "B", "C", "D", "F", "P", "NP", "W", "I", "IP"}
+
+    for line in cleaned_lines:
+        if 'Quarter' in line:
+            current_quarter = line
+            courses_by_quarter[current_quarter] = []
+        elif current_quarter and any(subject in line for subject in course_codes):
+            parts = line.split()
+
+            if len(parts) >= 4:
+                course_code = ' '.join(parts[0:2])
+
+                if not contains_any(parts[-2], all_grades):
+                    course_name = ' '.join(parts[2:-3])
+                    credits_earned = parts[-2]
+                    grade = "IP"
+                else:
+                    course_name = ' '.join(parts[2:-4])
+                    credits_earned = parts[-3]
+                    grade = parts[-2]
+
+                courses_by_quarter[current_quarter].append({
+                    'course_code': course_code,
+                    'course_name': course_name,
+                    'credits_earned': credits_earned,
+                    'grade': grade
+                })
+    return courses_by_quarter
+
+
+def best_of(repeat, func, *args):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, nargs='+', default=[10000, 100000, 500000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'lines':>8} {'legacy lines/s':>15} {'compiled lines/s':>17} {'speedup':>8}")
+    for size in args.lines:
+        lines = synthetic_transcript(size)
+        legacy, expected = best_of(args.repeat, legacy_parse_courses, lines)
+        compiled, parsed = best_of(args.repeat, parse_transcript_lines, lines, COURSE_LINE)
+        assert courses_to_dicts(parsed) == expected, "compiled parser disagrees with the legacy parser"
+        print(f"{size:>8} {size / legacy:>15,.0f} {size / compiled:>17,.0f} {legacy / compiled:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+#catalog.py
+"""Process-wide snapshot of the course.classInfo catalog.
+
+The snapshot is loaded once per process and kept in memory keyed by the
+normalized class code, so request handlers can answer course lookups,
+prerequisite lookups and catalog membership without a MongoDB round trip.
+A daemon thread refreshes it whenever the collection changes (via a change
+stream) or, on deployments without change streams, on a fixed interval.
+Each load first fills in the derived query fields (Subject, Course Number and
+the structured meeting times) on documents imported without them.
+
+classInfo only carries the free-text "Prereqs"; the structured "Parsed
+Prerequisites" live in classes.courseInfo, so each load also reads those,
+keyed by base course code, for the compiled prerequisite engine.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from meeting_times import MEETING_FIELDS, meeting_fields
+
+CATALOG_DB = "course"
+CATALOG_COLLECTION = "classInfo"
+CATALOG_REFRESH_SECONDS = int(os.getenv("CATALOG_REFRESH_SECONDS", "300"))
+
+# Structured prerequisites ('Course Code' is 'CSE 101 - Course Name')
+PREREQUISITES_DB = "classes"
+PREREQUISITES_COLLECTION = "courseInfo"
+PREREQUISITES_FIELD = "Parsed Prerequisites"
+
+DERIVED_FIELDS = ("Subject", "Course Number", *MEETING_FIELDS)
+
+# Documents lacking any field that build_criteria_query filters on
+MISSING_DERIVED_FIELDS = {"$or": [
+    {field: {"$exists": False}} for field in ("Subject", "Course Number", "Meeting Days", "Start Minute")
+]}
+
+
+def normalize_code(code):
+    """Normalize a class code, e.g. ' cse  101 ' -> 'CSE 101'."""
+    if not code:
+        return ""
+    return " ".join(str(code).upper().split())
+
+
+def code_fields(class_code):
+    """Derived, indexable fields for a class code: 'CSE 101A' -> Subject 'CSE', Course Number 101."""
+    parts = normalize_code(class_code).split(" ")
+    number = re.match(r"\d+", parts[1]) if len(parts) > 1 else None
+    return {"Subject": parts[0] or None, "Course Number": int(number.group()) if number else None}
+
+
+def backfill_derived_fields(collection, refresh=False, batch_size=1000):
+    """Store the derived query fields (Subject, Course Number, meeting times) on class documents.
+
+    Only documents missing one of them are read unless `refresh` is set, in
+    which case every document is recomputed (as after a catalog import) and
+    rewritten where a value changed. Returns the number of documents updated.
+    """
+    projection = {"Class Code": 1, "Days & Times": 1, **{field: 1 for field in DERIVED_FIELDS}}
+    updates = []
+    updated = 0
+    for doc in collection.find({} if refresh else MISSING_DERIVED_FIELDS, projection):
+        fields = {**code_fields(doc.get("Class Code")), **meeting_fields(doc.get("Days & Times"))}
+        if all(doc.get(field) == value for field, value in fields.items()):
+            continue
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+        if len(updates) >= batch_size:
+            updated += collection.bulk_write(updates, ordered=False).modified_count
+            updates = []
+    if updates:
+        updated += collection.bulk_write(updates, ordered=False).modified_count
+    return updated
+
+
+class CatalogSnapshot:
+    """In-memory view of every class document, keyed by normalized class code."""
+
+    def __init__(self, collection, refresh_interval=CATALOG_REFRESH_SECONDS):
+        self._collection = collection
+        self._refresh_interval = refresh_interval
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._sections = {}
+        self._prerequisites = {}
+        self._engine = None
+        self.version = 0
+        self.fingerprint = None
+        self.loaded_at = None
+
+    def load(self):
+        """Read the whole collection and atomically swap in the new snapshot.
+
+        The version only advances when the documents actually changed, so
+        anything keyed by it (compiled engines, cached results) survives
+        reloads that find nothing new.
+        """
+        with self._load_lock:
+            try:
+                backfilled = backfill_derived_fields(self._collection)
+                if backfilled:
+                    print(f"Derived query fields added to {backfilled} catalog documents", file=sys.stderr)
+            except PyMongoError as e:
+                print(f"Error backfilling derived catalog fields: {e}", file=sys.stderr)
+            sections = {}
+            digest = hashlib.sha256()
+            for doc in self._collection.find({}, {"_id": 0}):
+                digest.update(json.dumps(doc, sort_keys=True, default=str).encode("utf-8"))
+                code = normalize_code(doc.get("Class Code"))
+                if code:
+                    sections.setdefault(code, []).append(doc)
+            prerequisites = self._load_prerequisites()
+            digest.update(json.dumps(prerequisites, sort_keys=True, default=str).encode("utf-8"))
+            self.loaded_at = time.time()
+            if digest.hexdigest() == self.fingerprint:
+                return
+            # A single reference swap keeps readers on a consistent snapshot.
+            self._sections = sections
+            self._prerequisites = prerequisites
+            self.fingerprint = digest.hexdigest()
+            self.version += 1
+        print(f"Catalog snapshot v{self.version} loaded: {len(sections)} classes", file=sys.stderr)
+
+    def _load_prerequisites(self):
+        """Base course code -> 'Parsed Prerequisites' from classes.courseInfo."""
+        collection = self._collection.database.client[PREREQUISITES_DB][PREREQUISITES_COLLECTION]
+        prerequisites = {}
+        try:
+            for doc in collection.find({PREREQUISITES_FIELD: {"$exists": True}}, {"_id": 0, "Course Code": 1, PREREQUISITES_FIELD: 1}):
+                code = normalize_code(str(doc.get("Course Code", "")).split(" - ")[0])
+                if code:
+                    prerequisites.setdefault(code, doc[PREREQUISITES_FIELD])
+        except PyMongoError as e:
+            print(f"Error loading parsed prerequisites: {e}", file=sys.stderr)
+        return prerequisites
+
+    def ensure_loaded(self):
+        if self.loaded_at is None:
+            self.load()
+        return self
+
+    def __contains__(self, code):
+        return normalize_code(code) in self._sections
+
+    def __len__(self):
+        return len(self._sections)
+
+    def codes(self):
+        return list(self._sections)
+
+    def get(self, code):
+        """Return a copy of the first class document for a code, or None."""
+        sections = self._sections.get(normalize_code(code))
+        return dict(sections[0]) if sections else None
+
+    def sections(self, code):
+        """Return copies of every document (section) listed under a code."""
+        return [dict(doc) for doc in self._sections.get(normalize_code(code), [])]
+
+    def get_many(self, codes):
+        """Return the documents for the codes found in the catalog, in order."""
+        found = []
+        for code in codes:
+            doc = self.get(code)
+            if doc:
+                found.append(doc)
+        return found
+
+    def prerequisites(self, codes):
+        """Map each catalog code in `codes` to its 'Prereqs' text."""
+        prereqs = {}
+        for code in codes:
+            doc = self.get(code)
+            if doc:
+                prereqs[doc.get("Class Code", code)] = doc.get("Prereqs", "None")
+        return prereqs
+
+    def documents(self):
+        """Iterate over the first document of every class in the snapshot."""
+        for sections in list(self._sections.values()):
+            yield dict(sections[0])
+
+    def prerequisite_engine(self):
+        """Return the prerequisite engine compiled for the current snapshot version."""
+        from prereqs import PrerequisiteEngine
+
+        version = self.version
+        engine = self._engine
+        if engine is None or engine[0] != version:
+            prerequisites = self._prerequisites
+            pairs = [
+                (code, sections[0].get(PREREQUISITES_FIELD) or prerequisites.get(code))
+                for code, sections in list(self._sections.items())
+            ]
+            if pairs and not any(value for _, value in pairs):
+                print(
+                    f"Warning: no catalog course has {PREREQUISITES_FIELD!r}; every course will count as eligible "
+                    f"and unlock counts will be empty (is {PREREQUISITES_DB}.{PREREQUISITES_COLLECTION} populated?)",
+                    file=sys.stderr,
+                )
+            compiled = PrerequisiteEngine(pairs)
+            engine = self._engine = (version, compiled)
+        return engine[1]
+
+    def start_background_refresh(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="catalog-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        try:
+            self._watch_changes()
+        except PyMongoError as e:
+            # Standalone servers do not support change streams; fall back to polling.
+            print(f"Catalog change stream unavailable ({e}); polling every {self._refresh_interval}s", file=sys.stderr)
+            self._poll()
+
+    def _watch_changes(self):
+        with self._collection.watch(max_await_time_ms=1000) as stream:
+            pending = False
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    pending = True
+                    continue
+                # Reload once the burst of changes has gone quiet.
+                if pending:
+                    self._safe_load()
+                    pending = False
+
+    def _poll(self):
+        while not self._stop.wait(self._refresh_interval):
+            self._safe_load()
+
+    def _safe_load(self):
+        try:
+            self.load()
+        except PyMongoError as e:
+            print(f"Error refreshing catalog snapshot: {e}", file=sys.stderr)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog(client):
+    """Return the process-wide catalog snapshot, loading it on first use."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                snapshot = CatalogSnapshot(client[CATALOG_DB][CATALOG_COLLECTION])
+                snapshot.load()
+                snapshot.start_background_refresh()
+                _catalog = snapshot
+    return _catalog
@@ -0,0 +1,211 @@
+#clients.py
+"""Shared, lazily created MongoDB and OpenAI clients.
+
+Both the Flask app and the CLI take their clients from here, so each process
+keeps one connection pool per service instead of reconnecting per call.
+Pool sizes and timeouts come from the environment:
+
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS
+    OPENAI_TIMEOUT_SECONDS, OPENAI_CONNECT_TIMEOUT_SECONDS, OPENAI_MAX_RETRIES,
+    OPENAI_MAX_CONNECTIONS, OPENAI_MAX_KEEPALIVE_CONNECTIONS, OPENAI_KEEPALIVE_EXPIRY_SECONDS
+
+OPENAI_MAX_CONNECTIONS caps concurrent LLM requests per client; further
+requests wait for a free connection (up to OPENAI_TIMEOUT_SECONDS) rather than
+opening more. pool_stats() reports connection and request counters.
+"""
+import os
+import threading
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient, DefaultHttpxClient, OpenAI
+from pymongo import AsyncMongoClient, MongoClient, monitoring
+
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "5"))
+# Retries are handled by llm_gateway (with jitter and a shared limit); the SDK's own are off by default
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "0"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "30"))
+
+
+class MongoPoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters for every client created here."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"created": 0, "closed": 0, "checked_out": 0, "checked_in": 0, "checkout_failed": 0, "pools_cleared": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._count("pools_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._count("created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._count("closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._count("checkout_failed")
+
+    def connection_checked_out(self, event):
+        self._count("checked_out")
+
+    def connection_checked_in(self, event):
+        self._count("checked_in")
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        counts["open"] = counts["created"] - counts["closed"]
+        counts["in_use"] = counts["checked_out"] - counts["checked_in"]
+        counts["max_pool_size"] = MONGO_MAX_POOL_SIZE
+        return counts
+
+
+class OpenAIRequestStats:
+    """Request/response counters, fed by httpx event hooks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "responses": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def on_request(self, request):
+        self._count("requests")
+
+    def on_response(self, response):
+        self._count("responses")
+
+    async def on_request_async(self, request):
+        self.on_request(request)
+
+    async def on_response_async(self, response):
+        self.on_response(response)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        counts["max_connections"] = OPENAI_MAX_CONNECTIONS
+        counts["max_keepalive_connections"] = OPENAI_MAX_KEEPALIVE_CONNECTIONS
+        counts["timeout_seconds"] = OPENAI_TIMEOUT_SECONDS
+        counts["max_retries"] = OPENAI_MAX_RETRIES
+        return counts
+
+
+_mongo_stats = MongoPoolStats()
+_openai_stats = OpenAIRequestStats()
+
+
+def mongo_options():
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+        "event_listeners": [_mongo_stats],
+    }
+
+
+def _openai_timeout():
+    return httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS)
+
+
+def _openai_http_options():
+    return {
+        "timeout": _openai_timeout(),
+        "limits": httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    }
+
+
+def create_async_mongo_client():
+    """A pooled AsyncMongoClient; call from the event loop it should bind to."""
+    return AsyncMongoClient(os.getenv("MONGO_URI"), **mongo_options())
+
+
+def create_async_openai_client():
+    """A pooled AsyncOpenAI client with the configured timeouts and retries."""
+    http_client = DefaultAsyncHttpxClient(
+        event_hooks={"request": [_openai_stats.on_request_async], "response": [_openai_stats.on_response_async]},
+        **_openai_http_options()
+    )
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        timeout=_openai_timeout(),
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=http_client,
+    )
+
+
+_lock = threading.Lock()
+_mongo_client = None
+_openai_client = None
+
+
+def get_mongo_client():
+    """The process-wide MongoClient, created on first use."""
+    global _mongo_client
+    if _mongo_client is None:
+        with _lock:
+            if _mongo_client is None:
+                _mongo_client = MongoClient(os.getenv("MONGO_URI"), **mongo_options())
+    return _mongo_client
+
+
+def get_openai_client():
+    """The process-wide OpenAI client, created on first use."""
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                http_client = DefaultHttpxClient(
+                    event_hooks={"request": [_openai_stats.on_request], "response": [_openai_stats.on_response]},
+                    **_openai_http_options()
+                )
+                _openai_client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    timeout=_openai_timeout(),
+                    max_retries=OPENAI_MAX_RETRIES,
+                    http_client=http_client,
+                )
+    return _openai_client
+
+
+def pool_stats():
+    return {"mongo": _mongo_stats.stats(), "openai": _openai_stats.stats()}
@@ -0,0 +1,116 @@
+#curriculum_index.py
+"""Compiled curricula for fast degree-progress checks.
+
+A university.majors document is flattened once into bitmaps: for every
+course, which required groups it satisfies and which upper-division slots
+(in category order) it fills, plus a slot mask per category. Progress for a
+history is then a set intersection against the curriculum's courses and a
+handful of integer ORs, so running many histories against one major is cheap.
+Compiled curricula are cached by a fingerprint of their requirements.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+CURRICULUM_INDEX_SIZE = 256
+
+
+def curriculum_fingerprint(curriculum):
+    payload = json.dumps(
+        [curriculum.get("required_courses", []), curriculum.get("upper_div_categories", {})],
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def count_bits(mask):
+    return bin(mask).count("1")
+
+
+class CurriculumIndex:
+    """One curriculum compiled into course -> requirement bitmaps."""
+
+    def __init__(self, curriculum):
+        self.fingerprint = curriculum_fingerprint(curriculum)
+        self.required_groups = [list(group) for group in curriculum.get("required_courses", [])]
+        # Every upper-division course in category order (a course may fill more than one slot).
+        self.upper_div_courses = []
+        self.category_masks = {}
+        for category_name, courses in (curriculum.get("upper_div_categories") or {}).items():
+            mask = 0
+            for course_group in courses:
+                for course in course_group:
+                    mask |= 1 << len(self.upper_div_courses)
+                    self.upper_div_courses.append(course)
+            self.category_masks[category_name] = mask
+
+        self.required_bits = {}
+        for index, group in enumerate(self.required_groups):
+            for course in group:
+                self.required_bits[course] = self.required_bits.get(course, 0) | 1 << index
+        self.upper_bits = {}
+        for position, course in enumerate(self.upper_div_courses):
+            self.upper_bits[course] = self.upper_bits.get(course, 0) | 1 << position
+        self.courses = frozenset(self.required_bits) | frozenset(self.upper_bits)
+
+    def progress(self, history):
+        """(required_done, upper_taken) bitmaps for a history."""
+        required_done = 0
+        upper_taken = 0
+        for course in self.courses.intersection(history):
+            required_done |= self.required_bits.get(course, 0)
+            upper_taken |= self.upper_bits.get(course, 0)
+        return required_done, upper_taken
+
+    def update(self, required_done, upper_taken, history, changed):
+        """Adjust bitmaps for the courses in `changed`; only their groups are re-evaluated."""
+        touched = 0
+        for course in self.courses.intersection(changed):
+            touched |= self.required_bits.get(course, 0)
+            if course in history:
+                upper_taken |= self.upper_bits.get(course, 0)
+            else:
+                upper_taken &= ~self.upper_bits.get(course, 0)
+        if touched:
+            required_done &= ~touched
+            for index in range(len(self.required_groups)):
+                if touched >> index & 1 and any(course in history for course in self.required_groups[index]):
+                    required_done |= 1 << index
+        return required_done, upper_taken
+
+    def summarize(self, required_done, upper_taken):
+        """(remaining_required_courses, remaining_upper_div_courses, upper_div_electives_taken)."""
+        remaining_required_courses = [
+            group for index, group in enumerate(self.required_groups) if not required_done >> index & 1
+        ]
+        remaining_upper_div_courses = [
+            course for position, course in enumerate(self.upper_div_courses) if not upper_taken >> position & 1
+        ]
+        return remaining_required_courses, remaining_upper_div_courses, count_bits(upper_taken)
+
+    def category_progress(self, upper_taken):
+        return {
+            category_name: {"taken": count_bits(upper_taken & mask), "total": count_bits(mask)}
+            for category_name, mask in self.category_masks.items()
+        }
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_curriculum_index(curriculum):
+    """Return the compiled index for a curriculum document, compiling it on first use."""
+    fingerprint = curriculum_fingerprint(curriculum)
+    with _indexes_lock:
+        index = _indexes.get(fingerprint)
+        if index is not None:
+            _indexes.move_to_end(fingerprint)
+            return index
+    index = CurriculumIndex(curriculum)
+    with _indexes_lock:
+        _indexes[fingerprint] = index
+        while len(_indexes) > CURRICULUM_INDEX_SIZE:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,97 @@
+#incremental_planner.py
+"""Incremental degree-progress planning for repeat transcript uploads.
+
+For every student (keyed by transcript_parser.student_key) the planner
+keeps the state derived from their last upload: the course history, which
+required groups are satisfied, which upper-division courses are taken, the
+eligible candidates and the resulting recommendations. A new upload is
+diffed against that state; only the requirement groups containing an added
+or removed course are re-evaluated (CurriculumIndex.update), and the
+previous recommendations are reused when nothing that feeds them has
+changed: degree progress, eligible candidates, catalog version, and the
+prompt fingerprint. The fingerprint is a digest of the other prompt
+inputs, namely the full course history (courses outside the curriculum
+included) and the student's preferences.
+"""
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+from curriculum_index import get_curriculum_index
+from llm_cache import LLMCache
+
+PLANNER_STATE_SIZE = int(os.getenv("PLANNER_STATE_SIZE", "4096"))
+PLANNER_STATE_TTL_SECONDS = int(os.getenv("PLANNER_STATE_TTL_SECONDS", str(180 * 24 * 60 * 60)))
+
+PlannerState = namedtuple("PlannerState", [
+    "history", "curriculum_fingerprint", "required_done", "upper_taken",
+    "common_courses", "catalog_version", "prompt_fingerprint", "recommended_courses",
+])
+
+
+def prompt_fingerprint(student_history, preferences):
+    """Digest of the schedule prompt's inputs beyond degree progress: the full history and preferences."""
+    payload = json.dumps([list(student_history), preferences], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IncrementalPlanner:
+    """Per-student planner state in a bounded LRU + TTL store."""
+
+    def __init__(self, max_entries=PLANNER_STATE_SIZE, ttl_seconds=PLANNER_STATE_TTL_SECONDS):
+        self._states = LLMCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def progress(self, key, curriculum, student_history):
+        """Degree progress for this upload, diffed against the student's previous state.
+
+        Returns (state, previous, index). `state` has no recommendations yet;
+        `previous` is None when there was nothing to diff against.
+        """
+        history = frozenset(student_history)
+        index = get_curriculum_index(curriculum)
+        previous = self._states.get(key)
+        if previous is not None and previous.curriculum_fingerprint == index.fingerprint:
+            required_done, upper_taken = index.update(
+                previous.required_done, previous.upper_taken, history, history ^ previous.history
+            )
+        else:
+            previous = None
+            required_done, upper_taken = index.progress(history)
+        state = PlannerState(history, index.fingerprint, required_done, upper_taken, None, None, None, None)
+        return state, previous, index
+
+    def reusable_recommendations(self, previous, state, common_courses, catalog_version, fingerprint):
+        """The previous recommendations if nothing relevant changed, else None.
+
+        `fingerprint` is prompt_fingerprint() of this upload's history and preferences.
+        """
+        if previous is None or previous.recommended_courses is None:
+            return None
+        if (previous.required_done != state.required_done
+                or previous.upper_taken != state.upper_taken
+                or previous.common_courses != common_courses
+                or previous.catalog_version != catalog_version
+                or previous.prompt_fingerprint != fingerprint):
+            return None
+        return previous.recommended_courses
+
+    def record(self, key, state, common_courses, catalog_version, fingerprint, recommended_courses):
+        self._states.set(key, state._replace(
+            common_courses=list(common_courses),
+            catalog_version=catalog_version,
+            prompt_fingerprint=fingerprint,
+            recommended_courses=recommended_courses,
+        ))
+
+    def stats(self):
+        stats = self._states.stats()
+        stats.pop("persistent", None)
+        return stats
+
+
+_planner = IncrementalPlanner()
+
+
+def get_planner():
+    return _planner
@@ -0,0 +1,160 @@
+#indexes.py
+"""Index management for the course and university databases.
+
+Usage:
+    python indexes.py create   # backfill derived fields, then create indexes
+    python indexes.py verify   # explain() the app's queries, exit 1 on COLLSCAN
+
+Creating indexes is idempotent; re-running `create` after a catalog import
+refreshes the derived Subject/Course Number and meeting-time fields.
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+from pymongo import IndexModel, MongoClient
+from pymongo.errors import OperationFailure
+
+# Before the local imports, which read TTLs from the environment
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+
+from catalog import backfill_derived_fields
+from jobs import JOBS_COLLECTION, JOBS_DB
+from session_store import SESSION_TTL_SECONDS, SESSIONS_COLLECTION, SESSIONS_DB
+
+# Recommendations not refreshed by an upload for this long are removed
+RECOMMENDED_COURSES_TTL_SECONDS = int(os.getenv("RECOMMENDED_COURSES_TTL_SECONDS", str(180 * 24 * 60 * 60)))
+
+INDEXES = {
+    ("course", "classInfo"): [
+        IndexModel([("Class Code", 1)], name="class_code"),
+        IndexModel([("Subject", 1), ("Course Number", 1)], name="subject_course_number"),
+        IndexModel([("Subject", 1), ("Status", 1)], name="subject_status"),
+        IndexModel([("Meeting Days", 1), ("Start Minute", 1)], name="meeting_days_start"),
+        IndexModel([("Start Minute", 1)], name="start_minute"),
+        IndexModel([("Course Number", 1)], name="course_number"),
+        IndexModel([("Status", 1)], name="status"),
+        IndexModel([("GE", 1)], name="ge"),
+    ],
+    ("university", "majors"): [
+        IndexModel([("major", 1), ("admission_year", 1), ("type", 1)], name="major_admission_year_type"),
+    ],
+    ("course", "course-assistant-recommended-courses"): [
+        IndexModel([("student_id", 1)], name="student_id", unique=True),
+        IndexModel([("last_updated", 1)], name="last_updated_ttl", expireAfterSeconds=RECOMMENDED_COURSES_TTL_SECONDS),
+    ],
+    (SESSIONS_DB, SESSIONS_COLLECTION): [
+        # Sessions idle for SESSION_TTL_SECONDS are removed by MongoDB
+        IndexModel([("updated_at", 1)], name="updated_at_ttl", expireAfterSeconds=SESSION_TTL_SECONDS),
+    ],
+    (JOBS_DB, JOBS_COLLECTION): [
+        IndexModel([("status", 1), ("created", 1)], name="status_created"),
+        # expires_at is JOB_RESULT_TTL_SECONDS after a job ends, or after a queued/running one would go stale
+        IndexModel([("expires_at", 1)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+
+def remove_legacy_recommendations(collection):
+    """Delete recommendations keyed by the old per-process hash(); no upload can reach them again.
+
+    They are the documents whose last_updated is a string rather than a date, which the TTL index ignores.
+    """
+    return collection.delete_many({"last_updated": {"$type": "string"}}).deleted_count
+
+
+def create_indexes(client):
+    """Backfill derived fields and create every declared index."""
+    class_info = client["course"]["classInfo"]
+    print(f"Derived query fields updated on {backfill_derived_fields(class_info, refresh=True)} documents")
+    recommended = client["course"]["course-assistant-recommended-courses"]
+    print(f"Legacy recommendations removed: {remove_legacy_recommendations(recommended)}")
+
+    for (db_name, collection_name), models in INDEXES.items():
+        collection = client[db_name][collection_name]
+        try:
+            names = collection.create_indexes(models)
+        except OperationFailure as e:
+            raise SystemExit(f"Could not create indexes on {db_name}.{collection_name}: {e}")
+        print(f"{db_name}.{collection_name}: {', '.join(names)}")
+
+
+def verification_queries():
+    """The filters the app sends to MongoDB, with representative values."""
+    from PDFRead import build_criteria_query
+
+    criteria_samples = [
+        {"subject": "CSE"},
+        {"excluded_subjects": ["AM", "MATH"]},
+        {"subject": "CSE", "excluded_subjects": ["AM"], "level": "intermediate"},
+        {"time_of_day": "morning"},
+        {"days": "MWF", "time_of_day": "afternoon"},
+        {"days": "TR"},
+        {"ge": "MF"},
+        {"level": "advanced"},
+        {"open_only": True},
+        {"subject": "MATH", "open_only": True},
+    ]
+    queries = [
+        (f"query_courses_by_criteria {criteria}", ("course", "classInfo"), build_criteria_query(criteria))
+        for criteria in criteria_samples
+    ]
+    queries += [
+        ("upload_pdf curriculum", ("university", "majors"),
+         {"major": "Computer Science", "admission_year": "2021", "type": "BS"}),
+        ("upload_pdf recommended course details", ("course", "classInfo"),
+         {"Class Code": {"$in": ["CSE 101", "CSE 130"]}}),
+        ("query_courses_by_criteria upper-div fallback", ("course", "classInfo"),
+         {"Class Code": {"$in": ["CSE 115A", "CSE 120"]}}),
+        ("upload_pdf recommended courses upsert", ("course", "course-assistant-recommended-courses"),
+         {"student_id": "0" * 64}),
+    ]
+    # generate_personalized_schedule reads from the catalog snapshot (catalog.py),
+    # whose single full load per refresh is a deliberate collection scan.
+    return queries
+
+
+def plan_stages(plan):
+    """Yield every 'stage' name in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from plan_stages(value)
+
+
+def verify_indexes(client):
+    """Explain each app query; return the labels that fall back to COLLSCAN."""
+    failures = []
+    for label, (db_name, collection_name), query in verification_queries():
+        explain = client[db_name][collection_name].find(query).explain()
+        stages = set(plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {})))
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        print(f"[{status}] {label}: {sorted(stages)}")
+        if status != "ok":
+            failures.append(label)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create and verify MongoDB indexes for the course assistant.")
+    parser.add_argument("command", choices=["create", "verify"])
+    args = parser.parse_args()
+
+    client = MongoClient(os.getenv("MONGO_URI"))
+
+    if args.command == "create":
+        create_indexes(client)
+    else:
+        failures = verify_indexes(client)
+        if failures:
+            print(f"{len(failures)} queries are not index-covered", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
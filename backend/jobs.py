@@ -0,0 +1,299 @@
+#jobs.py
+"""Background jobs for long-running work such as transcript processing.
+
+submit() stores a job record and puts its id on a queue; a pool of worker
+threads takes ids off the queue, runs the registered handler and records
+progress, the result or the error. Clients poll get() (served by /jobs/<id>).
+Payloads must be plain data (bytes, strings, paths), since a shared store
+keeps them outside this process until a worker claims the job.
+
+Both halves are pluggable:
+    queue  put(job_id) (raising queue.Full when full) and get(timeout) -> job_id
+           (raising queue.Empty on timeout), e.g. a Redis list wrapper. The
+           default is an in-process queue bounded at JOB_QUEUE_SIZE.
+    store  create/get/update/claim/position/counts/expire, see InProcessJobStore.
+           MongoJobStore (course.course-assistant-jobs) lets any worker
+           process answer /jobs/<id> for a job another one is running.
+
+A job id that comes off the queue with no record (expired or lost) or with no
+payload is recorded as FAILED rather than dropped silently. Every update is
+also a heartbeat: a queued or running job not updated for JOB_STALE_SECONDS
+(its worker died, or its queue went with it) is marked FAILED and its payload
+dropped by the next submit(), and every record carries an expires_at so a
+store with a TTL index removes it even if no submit() ever runs again.
+"""
+import datetime
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+
+from pymongo import ReturnDocument
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "64"))
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", str(60 * 60)))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", str(30 * 60)))
+
+JOBS_DB = "course"
+JOBS_COLLECTION = "course-assistant-jobs"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+STALE_ERROR = "Job stopped reporting progress (its worker may have exited)"
+
+
+class JobQueueFull(Exception):
+    """Raised by submit() when the queue has no room for another job."""
+
+
+class InProcessQueue:
+    """Default queue backend: a bounded, thread-safe FIFO inside this process."""
+
+    def __init__(self, max_size=JOB_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=max_size)
+
+    def put(self, job_id):
+        self._queue.put_nowait(job_id)
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+
+class InProcessJobStore:
+    """Default store: job records in a process-local dict."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job):
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else {key: value for key, value in job.items() if key not in ("payload", "expires_at")}
+
+    def update(self, job_id, fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def claim(self, job_id, fields):
+        """Mark a queued job RUNNING (plus `fields`) and return {"payload": ...} (popped from the record), or None if it is not queued."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != QUEUED:
+                return None
+            job.update(fields, status=RUNNING)
+            return {"payload": job.pop("payload", None)}
+
+    def position(self, job_id, created):
+        with self._lock:
+            return 1 + sum(
+                1 for key, job in self._jobs.items()
+                if job["status"] == QUEUED and (job["created"], key) < (created, job_id)
+            )
+
+    def counts(self):
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+        return counts
+
+    def expire(self, now, ttl, stale_after, fields):
+        """Drop finished jobs older than `ttl` seconds; fail queued/running ones idle for `stale_after` with `fields`."""
+        with self._lock:
+            expired = []
+            for job_id, job in self._jobs.items():
+                if job["status"] in (DONE, FAILED):
+                    if now - job["updated"] > ttl:
+                        expired.append(job_id)
+                elif now - job["updated"] > stale_after:
+                    job.pop("payload", None)
+                    job.update(fields)
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+class MongoJobStore:
+    """One document per job, keyed by _id; records are removed by the expires_at TTL index."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def create(self, job):
+        self._collection.insert_one({"_id": job["job_id"], **job})
+
+    def get(self, job_id):
+        return self._collection.find_one({"_id": job_id}, {"_id": 0, "payload": 0, "expires_at": 0})
+
+    def update(self, job_id, fields):
+        self._collection.update_one({"_id": job_id}, {"$set": fields})
+
+    def delete(self, job_id):
+        self._collection.delete_one({"_id": job_id})
+
+    def claim(self, job_id, fields):
+        job = self._collection.find_one_and_update(
+            {"_id": job_id, "status": QUEUED},
+            {"$set": {**fields, "status": RUNNING}, "$unset": {"payload": ""}},
+            projection={"payload": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        return None if job is None else {"payload": job.get("payload")}
+
+    def position(self, job_id, created):
+        return 1 + self._collection.count_documents({"status": QUEUED, "created": {"$lt": created}})
+
+    def counts(self):
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for row in self._collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+    def expire(self, now, ttl, stale_after, fields):
+        # Finished jobs are left to the TTL index
+        self._collection.update_many(
+            {"status": {"$in": [QUEUED, RUNNING]}, "updated": {"$lt": now - stale_after}},
+            {"$set": fields, "$unset": {"payload": ""}},
+        )
+
+
+class JobManager:
+    """Job records plus the worker threads that drain the queue."""
+
+    def __init__(self, handler, workers=JOB_WORKERS, job_queue=None, store=None, result_ttl=JOB_RESULT_TTL_SECONDS,
+                 stale_after=JOB_STALE_SECONDS):
+        self.handler = handler
+        self.workers = workers
+        self.queue = job_queue or InProcessQueue()
+        self.store = store or InProcessJobStore()
+        self.result_ttl = result_ttl
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+
+    def submit(self, payload):
+        """Queue `payload` for the handler and return the new job id; raises JobQueueFull when full."""
+        self.start()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self.store.expire(now, self.result_ttl, self.stale_after, {
+            "status": FAILED, "error": STALE_ERROR, "updated": now, "expires_at": self._expires_at(now, FAILED),
+        })
+        self.store.create(self._record(job_id, now, status=QUEUED, payload=payload, expires_at=self._expires_at(now, QUEUED)))
+        try:
+            self.queue.put(job_id)
+        except queue.Full:
+            self.store.delete(job_id)
+            raise JobQueueFull("Too many queued jobs, try again later")
+        return job_id
+
+    def get(self, job_id):
+        """Public view of a job (without its payload), or None if unknown/expired."""
+        view = self.store.get(job_id)
+        if view is None:
+            return None
+        view["queue_position"] = self.store.position(job_id, view["created"]) if view["status"] == QUEUED else 0
+        return view
+
+    def update(self, job_id, **fields):
+        now = time.time()
+        fields["updated"] = now
+        fields["expires_at"] = self._expires_at(now, fields.get("status"))
+        self.store.update(job_id, fields)
+
+    def _expires_at(self, now, status):
+        """When a TTL index may remove the record: result_ttl after a job ends, else result_ttl after it would go stale."""
+        seconds = self.result_ttl if status in (DONE, FAILED) else self.stale_after + self.result_ttl
+        return datetime.datetime.fromtimestamp(now + seconds, datetime.timezone.utc)
+
+    def _record(self, job_id, now, **fields):
+        return {
+            "job_id": job_id,
+            "stage": None,
+            "progress": 0.0,
+            "result": None,
+            "error": None,
+            "created": now,
+            "updated": now,
+            **fields,
+        }
+
+    def progress(self, job_id):
+        """A callback the handler can call as progress(stage, fraction)."""
+        def report(stage, fraction):
+            self.update(job_id, stage=stage, progress=round(fraction, 2))
+        return report
+
+    def stats(self):
+        stats = {"workers": self.workers, "jobs": self.store.counts(), "store": type(self.store).__name__}
+        if hasattr(self.queue, "qsize"):
+            stats["queued"] = self.queue.qsize()
+        return stats
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job_id = self.queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            now = time.time()
+            claimed = self.store.claim(job_id, {"updated": now, "expires_at": self._expires_at(now, RUNNING)})
+            if claimed is None:
+                if self.store.get(job_id) is not None:
+                    continue  # delivered twice; another worker already has it
+                print(f"Job {job_id} has no record", file=sys.stderr)
+                self.store.create(self._record(
+                    job_id, now, status=FAILED, error="Job record was lost or expired before it ran",
+                    expires_at=self._expires_at(now, FAILED),
+                ))
+                continue
+            if claimed["payload"] is None:
+                print(f"Job {job_id} has no payload", file=sys.stderr)
+                self.update(job_id, status=FAILED, error="Job payload is missing")
+                continue
+            try:
+                result = self.handler(claimed["payload"], self.progress(job_id))
+                self.update(job_id, status=DONE, progress=1.0, result=result)
+            except Exception as e:
+                print(f"Job {job_id} failed: {e}", file=sys.stderr)
+                self.update(job_id, status=FAILED, error=str(e))
+
+
+def create_job_store(client=None, backend=None):
+    """MongoJobStore when JOB_STORE is "mongo" (the default with MONGO_URI set), else InProcessJobStore."""
+    backend = backend or os.getenv("JOB_STORE", "mongo" if os.getenv("MONGO_URI") else "memory")
+    if backend == "mongo" and client is not None:
+        return MongoJobStore(client[JOBS_DB][JOBS_COLLECTION])
+    return InProcessJobStore()
@@ -0,0 +1,226 @@
+#llm_cache.py
+"""Response cache for chat completions (blocking and streaming).
+
+Keys are derived from the model, a canonicalized copy of the messages
+(whitespace collapsed, so re-indented prompt templates hash the same) and any
+other request parameters (temperature, max_tokens, ...).
+LLMCache keeps an in-memory LRU with a TTL and can persist entries to a
+SQLite file so a restart does not throw away warm answers. Evicted entries
+are deleted from the file too, and expired or surplus rows are purged every
+LLM_CACHE_PURGE_SECONDS, so the file stays within max_entries. Anything with
+get(key) / set(key, value) / stats() can be plugged in via set_llm_cache().
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH")
+LLM_CACHE_PURGE_SECONDS = int(os.getenv("LLM_CACHE_PURGE_SECONDS", "300"))
+
+
+def canonicalize_messages(messages):
+    return [
+        {"role": message["role"], "content": " ".join(str(message.get("content", "")).split())}
+        for message in messages
+    ]
+
+
+def cache_key(model, messages, params=None):
+    payload = json.dumps(
+        {"model": model, "messages": canonicalize_messages(messages), "params": params or {}},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Thread-safe LRU + TTL cache with optional SQLite persistence."""
+
+    def __init__(self, max_entries=LLM_CACHE_SIZE, ttl_seconds=LLM_CACHE_TTL_SECONDS, path=None,
+                 purge_seconds=LLM_CACHE_PURGE_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.purge_seconds = purge_seconds
+        self._last_purge = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_created ON llm_cache (created)")
+            self._db.commit()
+            self.purge()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT value, created FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                if row:
+                    entry = (row[0], row[1])
+                    self._remember(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            if now - entry[1] > self.ttl_seconds:
+                self._forget(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        entry = (value, time.time())
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO llm_cache (key, value, created) VALUES (?, ?, ?)", (key, *entry))
+                self._db.commit()
+        if self._db is not None and entry[1] - self._last_purge > self.purge_seconds:
+            self.purge()
+
+    def delete(self, key):
+        with self._lock:
+            self._forget(key)
+
+    def purge(self):
+        """Delete expired rows, and the oldest rows beyond max_entries, from the SQLite file."""
+        if self._db is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._last_purge = now
+            self._db.execute("DELETE FROM llm_cache WHERE created < ?", (now - self.ttl_seconds,))
+            self._db.execute(
+                "DELETE FROM llm_cache WHERE key NOT IN (SELECT key FROM llm_cache ORDER BY created DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "persistent": self._db is not None,
+            }
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self.evictions += 1
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (evicted,))
+                self._db.commit()
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+
+_llm_cache = LLMCache(path=LLM_CACHE_PATH)
+
+
+def get_llm_cache():
+    return _llm_cache
+
+
+def set_llm_cache(cache):
+    """Swap in another cache implementation (or None to disable caching)."""
+    global _llm_cache
+    _llm_cache = cache
+
+
+def cached_chat_completion(openai_client, messages, model="chatgpt-4o-latest", use_cache=True, **kwargs):
+    """Return the completion text for `messages`, serving repeats from the cache."""
+    cache = _llm_cache if use_cache else None
+    key = cache_key(model, messages, kwargs) if cache is not None else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    response = openai_client.chat.completions.create(model=model, messages=messages, **kwargs)
+    content = response.choices[0].message.content
+
+    if cache is not None and content is not None:
+        cache.set(key, content)
+    return content
+
+
+def stream_chat_completion(openai_client, messages, model="chatgpt-4o-latest", use_cache=True, **kwargs):
+    """Yield completion text chunks as the model produces them.
+
+    A cached answer is replayed as a single chunk; a fresh answer is cached
+    once the stream has been consumed to the end.
+    """
+    cache = _llm_cache if use_cache else None
+    key = cache_key(model, messages, kwargs) if cache is not None else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+    for chunk in openai_client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs):
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    if cache is not None and parts:
+        cache.set(key, "".join(parts))
+
+
+async def cached_chat_completion_async(async_openai_client, messages, model="chatgpt-4o-latest", use_cache=True, **kwargs):
+    """Async variant of cached_chat_completion for an AsyncOpenAI client."""
+    cache = _llm_cache if use_cache else None
+    key = cache_key(model, messages, kwargs) if cache is not None else None
+    if cache is not None:
+        # The cache may be backed by SQLite; keep its I/O off the event loop
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+
+    response = await async_openai_client.chat.completions.create(model=model, messages=messages, **kwargs)
+    content = response.choices[0].message.content
+
+    if cache is not None and content is not None:
+        await asyncio.to_thread(cache.set, key, content)
+    return content
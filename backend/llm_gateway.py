@@ -0,0 +1,225 @@
+#llm_gateway.py
+"""Gateway for outbound chat completion calls.
+
+LLMGateway and AsyncLLMGateway wrap an OpenAI / AsyncOpenAI client and
+expose the same chat.completions.create(), so they drop into the
+llm_cache helpers unchanged. Every call through them:
+
+- takes one of LLM_MAX_CONCURRENCY slots, shared by every gateway in the
+  process (blocking, streaming and async alike);
+- is coalesced with identical in-flight requests (same model, messages and
+  parameters), which wait for and share the one upstream response; streams
+  are not coalesced;
+- is retried on 429, 5xx, timeouts and connection errors with full-jitter
+  exponential backoff (honouring Retry-After), up to LLM_MAX_ATTEMPTS.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import openai
+
+from llm_cache import canonicalize_messages
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+# How often an async caller re-checks for a free slot
+ASYNC_SLOT_POLL_SECONDS = 0.02
+
+
+def is_retryable(error):
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def retry_delay(error, attempt):
+    """Full-jitter backoff for retry number `attempt` (1-based), at least Retry-After."""
+    delay = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+    response = getattr(error, "response", None)
+    try:
+        retry_after = float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        retry_after = 0
+    return min(LLM_RETRY_MAX_SECONDS, max(delay, retry_after))
+
+
+def request_key(kwargs):
+    """Identity of a request for coalescing: model, canonical messages and every other parameter."""
+    payload = dict(kwargs)
+    payload["messages"] = canonicalize_messages(payload.get("messages", []))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class LLMLimiter:
+    """Process-wide concurrency slots plus call counters."""
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "coalesced": 0, "retries": 0, "failures": 0, "in_flight": 0, "waiting": 0}
+
+    def count(self, name, delta=1):
+        with self._lock:
+            self._counts[name] += delta
+
+    def acquire(self):
+        self.count("waiting")
+        self._slots.acquire()
+        self.count("waiting", -1)
+        self.count("in_flight")
+
+    async def acquire_async(self):
+        # Poll rather than block so waiting callers never tie up the event loop or its thread pool
+        self.count("waiting")
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(ASYNC_SLOT_POLL_SECONDS)
+        self.count("waiting", -1)
+        self.count("in_flight")
+
+    def release(self):
+        self.count("in_flight", -1)
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {**self._counts, "max_concurrency": self.max_concurrency}
+
+
+_limiter = LLMLimiter()
+
+
+def get_llm_limiter():
+    return _limiter
+
+
+class LLMGateway:
+    """Limited, coalesced and retried wrapper around an OpenAI client."""
+
+    def __init__(self, client, limiter=None):
+        self.client = client
+        self.limiter = limiter or _limiter
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        if kwargs.get("stream"):
+            return self._stream(kwargs)
+        key = request_key(kwargs)
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            self.limiter.count("coalesced")
+            return future.result()
+        try:
+            future.set_result(self._call(kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        return future.result()
+
+    def _call(self, kwargs):
+        self.limiter.acquire()
+        try:
+            return self._with_retries(kwargs)
+        finally:
+            self.limiter.release()
+
+    def _with_retries(self, kwargs):
+        for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+            self.limiter.count("calls")
+            try:
+                return self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                if attempt == LLM_MAX_ATTEMPTS or not is_retryable(e):
+                    self.limiter.count("failures")
+                    raise
+                delay = retry_delay(e, attempt)
+                self.limiter.count("retries")
+                print(f"LLM call failed ({e.__class__.__name__}), retry {attempt} in {delay:.2f}s", file=sys.stderr)
+                time.sleep(delay)
+
+    def _stream(self, kwargs):
+        # The slot is held until the stream is consumed or closed; only opening the stream is retried.
+        self.limiter.acquire()
+        try:
+            chunks = self._with_retries(kwargs)
+        except BaseException:
+            self.limiter.release()
+            raise
+
+        def generate():
+            try:
+                yield from chunks
+            finally:
+                self.limiter.release()
+
+        return generate()
+
+
+class AsyncLLMGateway:
+    """AsyncOpenAI counterpart of LLMGateway; use from a single event loop."""
+
+    def __init__(self, client, limiter=None):
+        self.client = client
+        self.limiter = limiter or _limiter
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self._in_flight = {}
+
+    async def create(self, **kwargs):
+        if kwargs.get("stream"):
+            raise ValueError("AsyncLLMGateway does not stream; use LLMGateway")
+        key = request_key(kwargs)
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.limiter.count("coalesced")
+            return await asyncio.shield(future)
+        future = self._in_flight[key] = asyncio.get_running_loop().create_future()
+        try:
+            future.set_result(await self._call(kwargs))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark it retrieved so an uncoalesced failure is not reported as never awaited
+            future.exception()
+        finally:
+            self._in_flight.pop(key, None)
+        return future.result()
+
+    async def _call(self, kwargs):
+        await self.limiter.acquire_async()
+        try:
+            for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+                self.limiter.count("calls")
+                try:
+                    return await self.client.chat.completions.create(**kwargs)
+                except Exception as e:
+                    if attempt == LLM_MAX_ATTEMPTS or not is_retryable(e):
+                        self.limiter.count("failures")
+                        raise
+                    delay = retry_delay(e, attempt)
+                    self.limiter.count("retries")
+                    print(f"LLM call failed ({e.__class__.__name__}), retry {attempt} in {delay:.2f}s", file=sys.stderr)
+                    await asyncio.sleep(delay)
+        finally:
+            self.limiter.release()
@@ -1,18 +1,29 @@
 from flask import Flask, request, jsonify
 import pandas as pd
-from openai import OpenAI
+import numpy as np
 from dotenv import load_dotenv
 import os
-from pymongo import MongoClient
 
-app = Flask(__name__)
+# Before the local imports, which read their pool sizes and limits from the environment
 load_dotenv()
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+from prereqs import PrerequisiteEngine
+from clients import get_mongo_client, get_openai_client
+from llm_cache import cached_chat_completion
+from llm_gateway import LLMGateway
+from prompt_builder import build_messages, course_row, pack_course_table
+
+app = Flask(__name__)
+
+openai_client = LLMGateway(get_openai_client())
+
+# Number of ranked candidate courses sent on to the schedule prompt
+CANDIDATE_COURSES = int(os.getenv("CANDIDATE_COURSES", "40"))
 
-def get_mongo_client():
-    mongo_uri = os.getenv("MONGO_URI")
-    return MongoClient(mongo_uri)
+DEGREE_WEIGHT = 3.0
+UNLOCK_WEIGHT = 1.0
+MAX_UNLOCKS = 5
+GE_WEIGHT = 2.0
 
 def load_courses_from_mongo(db_name, collection_name):
     client = get_mongo_client()
@@ -22,50 +33,125 @@ def load_courses_from_mongo(db_name, collection_name):
     return courses
 
 
-def limit_courses(courses, max_courses=300):
-    return courses.sample(n=min(len(courses), max_courses), random_state=42)
+def prepare_courses(df):
+    """Precompute the base course code (e.g. 'CSE 101') once as a categorical column."""
+    df = df.copy()
+    df['Base Code'] = df['Course Code'].str.split(' - ').str[0].astype('category')
+    return df
+
+def _category_mask(codes, category_mask):
+    # Broadcast a per-category mask back onto rows; missing codes (-1) map to False.
+    return np.append(np.asarray(category_mask, dtype=bool), False)[codes.cat.codes.to_numpy()]
+
+def filter_courses(df, student_history, required_courses, ges_taken, upper_electives_group, engine=None):
+    if 'Base Code' not in df:
+        df = prepare_courses(df)
+    if engine is None:
+        engine = PrerequisiteEngine.from_dataframe(df)
 
-def filter_courses(df, student_history, required_courses, ges_taken, upper_electives_group):
+    base_codes = df['Base Code']
+    categories = base_codes.cat.categories
+    elective_codes = {course for group in upper_electives_group for course in group}
+    required_codes = {course for group in required_courses for course in group}
+
+    lower_upper_cse = _category_mask(base_codes, categories.str.contains(r'CSE 1[0-6][0-9]'))
+    eligible = _category_mask(base_codes, engine.eligible_for(categories, student_history))
 
     df = df[
         ~df['General education'].isin(ges_taken) &
         (
-            df['Course Code'].str.contains(r'CSE 1[0-6][0-9]') |
-            df['Course Code'].str.split(' - ').str[0].isin([course for group in upper_electives_group for course in group]) |
-            df['Course Code'].str.split(' - ').str[0].isin([course for group in required_courses for course in group]) |
-            df.apply(lambda row: can_take_course(student_history, eval(row['Parsed Prerequisites']))[0], axis=1)
+            lower_upper_cse |
+            base_codes.isin(elective_codes) |
+            base_codes.isin(required_codes) |
+            eligible
         )
     ]
 
     return df
 
-def extract_prerequisites(df):
-    prerequisites = df[['Course Code', 'Parsed Prerequisites']].dropna()
-    prerequisites['Course Code'] = prerequisites['Course Code'].str.split(' - ').str[0]
-    return prerequisites
-
-def generate_schedule(courses, student_history, ge_history, required_courses, upper_electives_taken, upper_electives_needed, prerequisites, model="chatgpt-4o-latest"):
+def _category_values(codes, category_values):
+    # Like _category_mask, for per-category numbers; missing codes map to 0.
+    return np.append(np.asarray(category_values, dtype=float), 0.0)[codes.cat.codes.to_numpy()]
+
+def remaining_ge_codes(required_ges, ges_taken):
+    """GE codes from every required GE group the student has not covered yet."""
+    taken = set(ges_taken)
+    remaining = set()
+    for group in required_ges:
+        codes = [code.strip() for item in group for code in item.split(',') if code.strip()]
+        if not taken.intersection(codes):
+            remaining.update(codes)
+    return remaining
+
+def rank_candidates(df, student_history, required_courses, upper_electives_group, required_ges, ges_taken, unlock_counts=None, top_n=CANDIDATE_COURSES):
+    """Keep the top_n courses from filter_courses output, best first.
+
+    Courses score for each remaining requirement group they satisfy (upper
+    division elective groups included), for the later courses they unlock in
+    the prerequisite graph and for covering a GE the student still needs.
+    Courses already taken are dropped.
+    """
+    if 'Base Code' not in df:
+        df = prepare_courses(df)
+    if isinstance(upper_electives_group, dict):
+        upper_electives_group = [group for groups in upper_electives_group.values() for group in groups]
+
+    taken = set(student_history)
+    satisfies = {}
+    for group in list(required_courses) + list(upper_electives_group):
+        if taken.intersection(group):
+            continue
+        for course in set(group):
+            satisfies[course] = satisfies.get(course, 0) + 1
+
+    base_codes = df['Base Code']
+    categories = base_codes.cat.categories
+    unlock_counts = unlock_counts or {}
+    degree = _category_values(base_codes, [satisfies.get(code, 0) for code in categories])
+    unlocks = _category_values(base_codes, [min(unlock_counts.get(code, 0), MAX_UNLOCKS) for code in categories])
+    ge_needed = df['General education'].isin(remaining_ge_codes(required_ges, ges_taken)).to_numpy()
+
+    score = DEGREE_WEIGHT * degree + UNLOCK_WEIGHT * unlocks + GE_WEIGHT * ge_needed
+    score[base_codes.isin(taken).to_numpy()] = -np.inf
+    order = np.argsort(-score, kind='stable')[:top_n]
+    return df.iloc[order[np.isfinite(score[order])]]
+
+def course_rows(df):
+    """Prompt table rows for courseInfo rows ('Course Code' is 'CSE 101 - Course Name')."""
+    rows = []
+    for record in df.to_dict('records'):
+        code, _, title = str(record.get('Course Code', '')).partition(' - ')
+        rows.append(course_row(
+            code,
+            title=title,
+            units=record.get('Credits', ''),
+            times=record.get('Days & Times', ''),
+            ge=record.get('General education', ''),
+            prereqs=record.get('Parsed Prerequisites', ''),
+        ))
+    return rows
+
+def generate_schedule(courses, student_history, ge_history, required_courses, upper_electives_taken, upper_electives_needed, model="chatgpt-4o-latest"):
     
-    course_list = "\n".join(
-        f"{row.to_dict()}" 
-        for _, row in courses.iterrows()
-    )
+    # courses arrive best first from rank_candidates; keep that order, one row per code
+    candidates = {}
+    for row in course_rows(courses):
+        candidates.setdefault(row['code'], row)
+    course_table, rows_included, _ = pack_course_table(list(candidates.values()))
 
     prompt = f"""
-    Here is a list of available courses for next quarter:
+    Here is a table of available courses for next quarter, most relevant first:
     
-    {course_list}
+    {course_table}
     
     The student has only taken the following courses:
-    {student_history}
+    {', '.join(student_history)}
 
     The student has taken the following general education courses: 
-    {ge_history}
+    {', '.join(ge_history)}
     REMOVE GENERAL EDUCATION CLASSES FOR CONSIDERATION FROM THE COURSE LIST THAT THE STUDENT HAS ALREADY TAKEN.
     DO NOT RECOMMEND COURSES THAT THE STUDENT DOES NOT HAVE THE PREREQUISITES FOR IN THEIR HISTORY.
-    The prerequisites for the courses are as follows:
-    
-    {prerequisites}
+    The prereqs column lists the prerequisites for each course.
 
     REMOVE CLASSES FOR CONSIDERATION FROM THE COURSE LIST THAT THE STUDENT DOES NOT HAVE THE PREREQUISITES FOR.
 
@@ -94,15 +180,11 @@ def generate_schedule(courses, student_history, ge_history, required_courses, up
     If a class has discussion or lab sections, pick one that will be best for their schedule.
     """
 
-    response = openai_client.chat.completions.create(
+    response_message = cached_chat_completion(
+        openai_client,
         model=model,
-        messages=[
-            {"role": "system", "content": "You are an expert academic advisor."},
-            {"role": "user", "content": prompt},
-        ],
+        messages=build_messages("cli_schedule", "You are an expert academic advisor.", prompt, rows_included, len(courses)),
     )
-    
-    response_message = response.choices[0].message.content
 
     return response_message
 
@@ -112,25 +194,16 @@ def get_student_history_ges(df, student_history):
     ges = [ge for ge in ges if ge]
     return ges
 
-def can_take_course(taken, prerequisites):
-    for group in prerequisites:
-        if not any(course in taken for course in group):
-            return False
-        
-    return True, None 
+def get_eligible_courses(data, student_history, engine=None):
+    documents = [document for document in data if 'Parsed Prerequisites' in document]
+    if engine is None:
+        engine = PrerequisiteEngine.from_documents(documents, code_field='Course Code')
+    eligible = set(engine.eligible(student_history))
 
-def get_eligible_courses(data, student_history):
-    eligible_courses = []
-    for document in data:
-        if 'Parsed Prerequisites' in document:
-            prerequisites = document['Parsed Prerequisites']
-            if isinstance(prerequisites, str):
-                prerequisites = eval(prerequisites)
-
-            eligible = can_take_course(student_history, prerequisites)
-
-            if eligible and document['Course Code'] not in student_history:
-                eligible_courses.append(document)
+    eligible_courses = [
+        document for document in documents
+        if document['Course Code'].split(' - ')[0] in eligible
+    ]
 
     return pd.DataFrame(eligible_courses)
 
@@ -150,7 +223,10 @@ def main():
 
     
 
-    eligible_courses_df = get_eligible_courses(data, student_history)
+    engine = PrerequisiteEngine.from_documents(
+        [document for document in data if 'Parsed Prerequisites' in document], code_field='Course Code'
+    )
+    eligible_courses_df = prepare_courses(get_eligible_courses(data, student_history, engine))
 
     ge_history = get_student_history_ges(eligible_courses_df, student_history)
 
@@ -173,13 +249,12 @@ def main():
     upper_electives_needed = major_data['upper_electives_needed'].iloc[0] - upper_electives_taken
 
 
-    filtered_courses = filter_courses(eligible_courses_df, student_history, required_courses, ges_taken = ge_history, upper_electives_group = upper_electives_group)
-    limited_courses = limit_courses(filtered_courses)
-    prerequisites = extract_prerequisites(limited_courses)
-    schedule = generate_schedule(limited_courses, student_history=student_history, 
+    filtered_courses = filter_courses(eligible_courses_df, student_history, required_courses, ges_taken = ge_history, upper_electives_group = upper_electives_group, engine = engine)
+    ranked_courses = rank_candidates(filtered_courses, student_history, courses_left, upper_electives_group,
+                                     required_ges = required_ges, ges_taken = ge_history, unlock_counts = engine.unlock_counts())
+    schedule = generate_schedule(ranked_courses, student_history=student_history, 
                                  ge_history=ge_history, required_courses=courses_left, 
-                                 upper_electives_taken = upper_electives_taken, upper_electives_needed = upper_electives_needed,
-                                 prerequisites=prerequisites)
+                                 upper_electives_taken = upper_electives_taken, upper_electives_needed = upper_electives_needed)
     
     print("Suggested Schedule:")
     print(schedule)
@@ -0,0 +1,184 @@
+#meeting_times.py
+"""Parse 'Days & Times' strings into structured meetings.
+
+A meeting pattern such as "MWF 09:20AM-10:25AM" or "TuTh 01:30PM-03:05PM"
+becomes a Meeting(days, start, end): a weekday bitmask plus start/end minutes
+after midnight. Meetings can also be rendered as an interval bitmap (one bit
+per 5-minute slot per weekday) so time conflicts are a single AND.
+"""
+import re
+from collections import namedtuple
+
+Meeting = namedtuple("Meeting", ["days", "start", "end"])
+
+DAY_BITS = {"M": 1, "T": 2, "W": 4, "R": 8, "F": 16, "S": 32, "U": 64}
+DAY_ORDER = ["M", "T", "W", "R", "F", "S", "U"]
+DAY_NAMES = {
+    "M": "Monday", "T": "Tuesday", "W": "Wednesday", "R": "Thursday",
+    "F": "Friday", "S": "Saturday", "U": "Sunday",
+}
+# Two-letter abbreviations used by the class search, mapped onto single letters.
+DAY_ALIASES = {"TU": "T", "TH": "R", "SA": "S", "SU": "U"}
+
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+
+TIME_OF_DAY_RANGES = {
+    "morning": (0, 12 * 60),
+    "afternoon": (12 * 60, 17 * 60),
+    "evening": (17 * 60, 24 * 60),
+}
+
+# Spelled-out and abbreviated day names (any case), matched as whole words before single letters.
+_DAY_WORDS = [
+    ("SU", r"weekends?"),
+    ("MTWRF", r"weekdays?"),
+    ("M", r"mon(?:day)?s?"),
+    ("T", r"tue(?:s(?:day)?)?s?"),
+    ("W", r"wed(?:nesday)?s?"),
+    ("R", r"thu(?:r(?:s(?:day)?)?)?s?"),
+    ("F", r"fri(?:day)?s?"),
+    ("S", r"sat(?:urday)?s?"),
+    ("U", r"sun(?:day)?s?"),
+]
+_DAY_WORD = re.compile(r"\b(?:" + "|".join(f"({pattern})" for _, pattern in _DAY_WORDS) + r")\b", re.IGNORECASE)
+# Catalog day letters ("MWF", "TuTh"); case-sensitive so ordinary words are not read as days.
+_DAY_TOKEN = re.compile(r"Tu|Th|Sa|Su|M|T|W|R|F|S|U")
+_TIME = r"(\d{1,2})(?::(\d{2}))?\s*([AaPp][Mm])?"
+_MEETING = re.compile(r"([A-Za-z]+)\s+" + _TIME + r"\s*-\s*" + _TIME)
+
+
+def parse_time(value):
+    """Parse a time like '8:00 AM', '01:30PM' or '13:30' into minutes after midnight."""
+    if value is None:
+        return None
+    match = re.fullmatch(r"\s*" + _TIME + r"\s*", str(value))
+    if not match:
+        return None
+    return _to_minutes(*match.groups())
+
+
+def _to_minutes(hour, minute, meridiem):
+    hour = int(hour)
+    minute = int(minute or 0)
+    if meridiem:
+        meridiem = meridiem.upper()
+        if hour == 12:
+            hour = 0
+        if meridiem == "PM":
+            hour += 12
+    if hour > 24 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def parse_days(value):
+    """Turn 'MWF', 'TuTh', 'TR', 'Friday', 'weekends' or ['M', 'Wed'] into a weekday bitmask."""
+    if not value:
+        return 0
+    if isinstance(value, (list, tuple, set)):
+        value = " ".join(str(day) for day in value)
+    mask = 0
+
+    def take_word(match):
+        nonlocal mask
+        for day in _DAY_WORDS[match.lastindex - 1][0]:
+            mask |= DAY_BITS[day]
+        return " "
+
+    for token in _DAY_TOKEN.findall(_DAY_WORD.sub(take_word, str(value))):
+        mask |= DAY_BITS[DAY_ALIASES.get(token.upper(), token)]
+    return mask
+
+
+def days_to_string(mask):
+    return "".join(day for day in DAY_ORDER if mask & DAY_BITS[day])
+
+
+def parse_meetings(days_and_times):
+    """Parse every meeting in a 'Days & Times' string. TBA/Cancelled yield []."""
+    meetings = []
+    if not days_and_times or not isinstance(days_and_times, str):
+        return meetings
+    for match in _MEETING.finditer(days_and_times):
+        days = parse_days(match.group(1))
+        end_meridiem = match.group(7)
+        # "10:40-11:45AM" style ranges share the trailing AM/PM.
+        start = _to_minutes(match.group(2), match.group(3), match.group(4) or end_meridiem)
+        end = _to_minutes(match.group(5), match.group(6), end_meridiem)
+        if days and start is not None and end is not None:
+            if end < start and not match.group(4) and end_meridiem and end_meridiem.upper() == "PM":
+                start = _to_minutes(match.group(2), match.group(3), "AM")
+            meetings.append(Meeting(days, start, end))
+    return meetings
+
+
+def meeting_bitmap(meetings):
+    """Encode meetings as one int with a bit per 5-minute slot per weekday."""
+    bitmap = 0
+    for meeting in meetings:
+        first = meeting.start // SLOT_MINUTES
+        last = max(first + 1, -(-meeting.end // SLOT_MINUTES))
+        span = ((1 << (last - first)) - 1) << first
+        for index, day in enumerate(DAY_ORDER):
+            if meeting.days & DAY_BITS[day]:
+                bitmap |= span << (index * SLOTS_PER_DAY)
+    return bitmap
+
+
+def format_minutes(minutes):
+    hour, minute = divmod(minutes, 60)
+    meridiem = "AM" if hour < 12 else "PM"
+    return f"{(hour - 1) % 12 + 1}:{minute:02d}{meridiem}"
+
+
+# Structured fields stored on each classInfo document so time and day filters
+# can use indexed range/equality predicates instead of regex scans.
+MEETING_FIELDS = ("Meetings", "Meeting Days", "Start Minute", "End Minute")
+
+
+def meeting_fields(days_and_times):
+    """Structured meeting fields for one section's 'Days & Times' value."""
+    meetings = parse_meetings(days_and_times)
+    if not meetings:
+        return {"Meetings": [], "Meeting Days": 0, "Start Minute": None, "End Minute": None}
+    days = 0
+    for meeting in meetings:
+        days |= meeting.days
+    return {
+        "Meetings": [meeting._asdict() for meeting in meetings],
+        "Meeting Days": days,
+        "Start Minute": min(meeting.start for meeting in meetings),
+        "End Minute": max(meeting.end for meeting in meetings),
+    }
+
+
+def day_masks_including(mask):
+    """Every weekday bitmask that contains all of `mask`'s days, for an indexable $in."""
+    return [candidate for candidate in range(1, 1 << len(DAY_ORDER)) if candidate & mask == mask]
+
+
+def day_masks_excluding(mask):
+    """Every weekday bitmask (including 0/TBA) that avoids all of `mask`'s days."""
+    return [candidate for candidate in range(0, 1 << len(DAY_ORDER)) if not candidate & mask]
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    # catalog imports this module, so its shared backfill is only imported when run as a script
+    from catalog import backfill_derived_fields
+
+    # Indexes over these fields are declared in indexes.py.
+    parser = argparse.ArgumentParser(description="Precompute meeting times and the other derived query fields on course.classInfo.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+    collection = MongoClient(os.getenv("MONGO_URI"))["course"]["classInfo"]
+    print(f"Updated derived fields on {backfill_derived_fields(collection, refresh=True, batch_size=args.batch_size)} sections")
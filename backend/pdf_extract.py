@@ -0,0 +1,171 @@
+#pdf_extract.py
+"""PDF text extraction on a process pool.
+
+PyPDF2 is pure Python, so parsing a transcript on a request thread holds the
+GIL and stalls every other request served by that worker. extract_text()
+runs the parse in worker processes instead: the first task reads the page
+count and the first chunk of pages, and larger documents fan their
+remaining pages out across the pool in PDF_PAGES_PER_TASK chunks.
+
+The pool is PDF_WORKERS single-process lanes rather than one executor, so a
+file that blows its timeout kills and replaces only the lanes still running
+its pages; other uploads' work on the remaining lanes carries on, and any of
+their chunks queued on a recycled lane are resubmitted.
+
+Limits (all from the environment):
+    PDF_MAX_BYTES        reject larger files before parsing
+    PDF_MAX_PAGES        reject documents with more pages
+    PDF_TIMEOUT_SECONDS  wall-clock budget for one file
+    PDF_WORKERS          pool size; 0 parses in-process (no pool)
+"""
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import PyPDF2
+
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(10 * 1024 * 1024)))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "50"))
+PDF_TIMEOUT_SECONDS = float(os.getenv("PDF_TIMEOUT_SECONDS", "20"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "4"))
+
+
+class PDFLimitError(ValueError):
+    """The PDF is larger than the configured byte or page limit."""
+
+
+class PDFTimeoutError(TimeoutError):
+    """Extraction did not finish within the configured timeout."""
+
+
+def _extract_pages(data, start, stop, max_pages=None):
+    """Worker task: return (page_count, text of pages[start:stop])."""
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    page_count = len(reader.pages)
+    if max_pages is not None and page_count > max_pages:
+        return page_count, None
+    stop = min(stop, page_count)
+    return page_count, ''.join(reader.pages[index].extract_text() or "" for index in range(start, stop))
+
+
+class _Lane:
+    """One single-process executor; the pool is PDF_WORKERS of these."""
+
+    def __init__(self):
+        self.executor = ProcessPoolExecutor(max_workers=1)
+        self.pending = 0
+        self.retired = False
+
+    def done(self, future):
+        with _pool_lock:
+            self.pending -= 1
+
+
+_lanes = None
+_pool_lock = threading.Lock()
+
+
+def get_pdf_pool():
+    """The shared extraction lanes, created on first use (None when PDF_WORKERS is 0)."""
+    global _lanes
+    if PDF_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _lanes is None:
+            _lanes = [_Lane() for _ in range(PDF_WORKERS)]
+        return _lanes
+
+
+def _submit(*args):
+    """Run _extract_pages on the least busy lane; returns (lane, future)."""
+    lanes = get_pdf_pool()
+    with _pool_lock:
+        lane = min(lanes, key=lambda candidate: candidate.pending)
+        lane.pending += 1
+        future = lane.executor.submit(_extract_pages, *args)
+    future.add_done_callback(lane.done)
+    return lane, future
+
+
+def _recycle_lane(lane):
+    # A task stuck past its deadline (or a dead worker) takes down only its own
+    # lane: that one process is killed and replaced, the other lanes keep running.
+    with _pool_lock:
+        if lane.retired:
+            return
+        lane.retired = True
+        if _lanes is not None and lane in _lanes:
+            _lanes[_lanes.index(lane)] = _Lane()
+    for process in list((getattr(lane.executor, "_processes", None) or {}).values()):
+        process.terminate()
+    lane.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def read_pdf_bytes(source, max_bytes=PDF_MAX_BYTES):
+    """Return the PDF's bytes from a path, a file object or bytes, enforcing max_bytes."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    elif hasattr(source, "read"):
+        data = source.read(max_bytes + 1)
+    else:
+        if os.path.getsize(source) > max_bytes:
+            raise PDFLimitError(f"PDF is larger than {max_bytes} bytes")
+        with open(source, 'rb') as file:
+            data = file.read()
+    if len(data) > max_bytes:
+        raise PDFLimitError(f"PDF is larger than {max_bytes} bytes")
+    return data
+
+
+def extract_text(source, max_bytes=PDF_MAX_BYTES, max_pages=PDF_MAX_PAGES,
+                 timeout=PDF_TIMEOUT_SECONDS, pages_per_task=PDF_PAGES_PER_TASK):
+    """Extract the text of every page, in order, within the configured limits."""
+    data = read_pdf_bytes(source, max_bytes)
+    pool = get_pdf_pool()
+    if pool is None:
+        page_count, text = _extract_pages(data, 0, max_pages, max_pages)
+        if text is None:
+            raise PDFLimitError(f"PDF has {page_count} pages; the limit is {max_pages}")
+        return text
+
+    deadline = time.monotonic() + timeout
+    tasks = []
+
+    def result(index):
+        # Work queued on a lane that another file's timeout recycled is resubmitted once
+        args, lane, future = tasks[index]
+        try:
+            return future.result(timeout=max(0, deadline - time.monotonic()))
+        except (BrokenProcessPool, CancelledError):
+            if not lane.retired:
+                raise
+        tasks[index] = (args, *_submit(*args))
+        return tasks[index][2].result(timeout=max(0, deadline - time.monotonic()))
+
+    try:
+        tasks.append(((data, 0, pages_per_task, max_pages), *_submit(data, 0, pages_per_task, max_pages)))
+        page_count, first = result(0)
+        if first is None:
+            raise PDFLimitError(f"PDF has {page_count} pages; the limit is {max_pages}")
+
+        for start in range(pages_per_task, page_count, pages_per_task):
+            args = (data, start, start + pages_per_task)
+            tasks.append((args, *_submit(*args)))
+        parts = [first] + [result(index)[1] for index in range(1, len(tasks))]
+        return ''.join(parts)
+    except FutureTimeoutError:
+        for _, lane, future in tasks:
+            if not future.cancel() and future.running():
+                _recycle_lane(lane)
+        print(f"PDF extraction timed out after {timeout}s", file=sys.stderr)
+        raise PDFTimeoutError(f"PDF extraction took longer than {timeout} seconds")
+    except BrokenProcessPool:
+        for _, lane, future in tasks:
+            if future.done() and isinstance(future.exception(), BrokenProcessPool):
+                _recycle_lane(lane)
+        raise
@@ -0,0 +1,288 @@
+#preference_rules.py
+"""Deterministic fast path for criteria and preference extraction.
+
+Short chat messages like "no MATH classes, mornings, MWF" are scanned with
+a handful of rules (department codes, time of day, day patterns, days off,
+units, GE codes, open seats, ...). Every word the rules explain, plus
+common filler, counts as covered; the share of covered words is the
+confidence. Callers fall back to the LLM when the confidence is below
+RULE_CONFIDENCE_THRESHOLD.
+
+Negations scope over the department codes, weekdays and times of day that
+follow them ("no MATH", "without friday classes"). A negation or number the
+rules did not consume would mean a dropped or inverted constraint, so it
+sets the confidence to 0 and the message goes to the LLM.
+"""
+import os
+import re
+
+RULE_CONFIDENCE_THRESHOLD = float(os.getenv("RULE_CONFIDENCE_THRESHOLD", "0.75"))
+
+GE_CODES = ["CC", "ER", "IM", "MF", "SI", "SR", "TA", "C", "DC", "PE-T", "PE-H", "PE-E", "PR-E", "PR-C", "PR-S"]
+
+FILLER_WORDS = {
+    "a", "an", "the", "i", "i'd", "i'm", "me", "my", "we", "want", "wanna", "need", "would", "like", "prefer",
+    "please", "can", "could", "you", "give", "show", "find", "get", "recommend", "suggest", "some", "any",
+    "other", "than", "besides", "classes", "class", "courses", "course", "schedule", "options", "only",
+    "and", "or", "but", "with", "in", "on", "at", "of", "for", "to", "from", "that", "are", "is",
+    "be", "have", "has", "it", "this", "next", "quarter", "also", "just", "more", "less",
+    "do", "anything", "none", "make", "build", "create", "plan",
+    "help", "what", "which", "should", "take", "good", "best", "per", "a.m.", "p.m.", "days", "day", "time",
+    "times", "one", "ones", "all", "so", "am", "im", "let", "lets", "there", "up", "total", "around", "about",
+    "maybe", "really", "keep", "them", "they", "those", "these", "will", "after", "before", "by", "free",
+}
+
+NEGATIONS = {"no", "not", "avoid", "without", "except", "excluding", "besides", "than", "don't", "dont", "skip", "hate"}
+NEGATION_WINDOW = 4
+
+WEEKDAYS = {
+    "monday": "M", "mondays": "M", "mon": "M",
+    "tuesday": "T", "tuesdays": "T", "tue": "T", "tues": "T",
+    "wednesday": "W", "wednesdays": "W", "wed": "W",
+    "thursday": "R", "thursdays": "R", "thu": "R", "thurs": "R",
+    "friday": "F", "fridays": "F", "fri": "F",
+}
+TIME_WORDS = {
+    "morning": "morning", "mornings": "morning", "early": "morning",
+    "afternoon": "afternoon", "afternoons": "afternoon", "midday": "afternoon",
+    "evening": "evening", "evenings": "evening", "night": "evening", "nights": "evening",
+}
+WORKLOAD_WORDS = {
+    "light": "light", "easy": "light", "easier": "light", "chill": "light",
+    "balanced": "balanced", "moderate": "balanced", "manageable": "balanced",
+    "challenging": "challenging", "hard": "challenging", "harder": "challenging", "rigorous": "challenging",
+}
+LEVEL_PHRASES = [
+    (r"\bupper[\s-]?div(?:ision)?\b", "intermediate"),
+    (r"\blower[\s-]?div(?:ision)?\b|\bintro(?:ductory)?\b", "introductory"),
+    (r"\bgrad(?:uate)?[\s-]?level\b|\badvanced\b", "advanced"),
+]
+
+_TOKEN = re.compile(r"[A-Za-z](?:[A-Za-z'.-]*[A-Za-z])?|\d+(?::\d{2})?\s*(?:[ap]\.?m\.?)?", re.IGNORECASE)
+_TIME = r"(\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?)"
+
+
+def _normalize_time(value):
+    match = re.fullmatch(r"(\d{1,2})(?::(\d{2}))?\s*([ap])?\.?m?\.?", value.strip().lower())
+    if not match:
+        return None
+    hour, minute, meridiem = int(match.group(1)), match.group(2) or "00", match.group(3)
+    if not meridiem:
+        # Bare hours: 8-11 read as morning, 12-7 as afternoon/evening.
+        meridiem = "a" if 8 <= hour <= 11 else "p"
+    return f"{hour}:{minute} {meridiem.upper()}M"
+
+
+def scan_message(message, course_codes):
+    """Run every rule over `message`; return (signals, confidence)."""
+    signals = {}
+    covered = set()
+    tokens = [(match.start(), match.end(), match.group()) for match in _TOKEN.finditer(message)]
+    lowered = message.lower()
+
+    def cover(start, end):
+        for index, (token_start, token_end, _) in enumerate(tokens):
+            if token_start < end and token_end > start:
+                covered.add(index)
+
+    def negations_before(index):
+        """Indices of negation words within NEGATION_WINDOW tokens before `index`, in the same clause."""
+        clause_start = max(message.rfind(mark, 0, tokens[index][0]) for mark in ".;!?,")
+        return [
+            position for position in range(max(0, index - NEGATION_WINDOW), index)
+            if tokens[position][0] > clause_start and tokens[position][2].lower() in NEGATIONS
+        ]
+
+    # Department codes: uppercase tokens from the course_codes list, negated when
+    # a negation word appears shortly before them ("no MATH or PHYS").
+    codes = set(course_codes)
+    last_excluded = None
+    for index, (start, end, token) in enumerate(tokens):
+        if token not in codes:
+            continue
+        previous = tokens[index - 1][2] if index else ""
+        if token == "AM" and re.fullmatch(r"\d+(?::\d{2})?", previous):
+            continue
+        clause_start = max(message.rfind(mark, 0, start) for mark in ".;!?")
+        negations = [
+            position for position in range(max(0, index - NEGATION_WINDOW), index)
+            if tokens[position][0] > clause_start and tokens[position][2].lower() in NEGATIONS
+        ]
+        covered.update(negations)
+        # A negation carries over a list of codes: "no MATH, AM or PHYS".
+        listed = last_excluded is not None and re.fullmatch(
+            r"[\s,/]*(?:(?:or|and|nor)[\s,/]*)*", message[tokens[last_excluded][1]:start], re.IGNORECASE
+        ) is not None
+        key = "excluded_subjects" if negations or listed else "subjects"
+        if key == "excluded_subjects":
+            last_excluded = index
+        if token not in signals.setdefault(key, []):
+            signals[key].append(token)
+        covered.add(index)
+
+    # GE codes ("GE MF", "an IM", "PR-E"); the one-letter C only right after "GE".
+    for match in re.finditer(r"\b(?:GEs?\s+)?(" + "|".join(sorted(map(re.escape, GE_CODES), key=len, reverse=True)) + r")\b", message):
+        code = match.group(1)
+        if code == "C" and not match.group(0).upper().startswith("GE"):
+            continue
+        if code in codes:
+            continue
+        signals.setdefault("ge", code)
+        cover(*match.span())
+    if re.search(r"\bgen(?:eral)?[\s-]?ed(?:ucation)?s?\b|\bGEs?\b", message, re.IGNORECASE):
+        signals["prefer_ges"] = True
+        for match in re.finditer(r"\bgen(?:eral)?[\s-]?ed(?:ucation)?s?\b|\bGEs?\b", message, re.IGNORECASE):
+            cover(*match.span())
+
+    for index, (_, _, token) in enumerate(tokens):
+        word = token.lower()
+        if word in TIME_WORDS:
+            # "no evening classes" / "I dont like mornings": left uncovered for the LLM
+            if negations_before(index):
+                continue
+            signals.setdefault("time_of_day", TIME_WORDS[word])
+            covered.add(index)
+        elif word in WORKLOAD_WORDS:
+            signals.setdefault("workload", WORKLOAD_WORDS[word])
+            covered.add(index)
+
+    # Day patterns: MWF / TR / TuTh or spelled-out pairs.
+    for match in re.finditer(r"\b(MWF|MW|TR|TTh|TuTh)\b", message):
+        signals.setdefault("days", match.group(1) if match.group(1).startswith("M") else "TR")
+        cover(*match.span())
+
+    # Days off: "no classes on friday", "fridays off", "free fridays", "day off monday".
+    days_off = []
+    for match in re.finditer(
+        r"\b(?:no\s+(?:classes|class|courses)\s+on|(?:day|days)\s+off\s+(?:on\s+)?|free)\s+(\w+)"
+        r"|\b(\w+)\s+off\b", lowered
+    ):
+        day = WEEKDAYS.get(match.group(1) or match.group(2))
+        if day:
+            days_off.append(day)
+            cover(*match.span())
+    # Negated weekdays are days off too: "without friday classes", "no monday or friday".
+    preferred_days = []
+    for index, (_, _, word) in enumerate(tokens):
+        day = WEEKDAYS.get(word.lower())
+        if not day or index in covered:
+            continue
+        negations = negations_before(index)
+        if negations:
+            days_off.append(day)
+            covered.update(negations)
+            covered.add(index)
+        elif day not in days_off:
+            preferred_days.append((index, day))
+    if days_off:
+        signals["days_off"] = sorted(set(days_off), key="MTWRF".index)
+
+    if preferred_days and "days" not in signals:
+        pattern = "".join(sorted({day for _, day in preferred_days}, key="MTWRF".index))
+        signals["days"] = {"MWF": "MWF", "TR": "TR"}.get(pattern, pattern)
+        covered.update(index for index, _ in preferred_days)
+
+    for match in re.finditer(r"\b(\d{1,2})\s*(?:units?|credits?)\b", lowered):
+        signals["units"] = int(match.group(1))
+        cover(*match.span())
+
+    for match in re.finditer(r"\b(?:at\s+most|max(?:imum)?|no\s+more\s+than|up\s+to)\s+(\d)\s+(?:classes|class|courses)\s+(?:a|per)\s+day\b", lowered):
+        signals["max_per_day"] = int(match.group(1))
+        cover(*match.span())
+
+    for match in re.finditer(r"\b(?:after|not\s+before|no\s+classes\s+before|start(?:ing)?\s+(?:at|after))\s+" + _TIME, lowered):
+        signals["earliest"] = _normalize_time(match.group(1))
+        cover(*match.span())
+    for match in re.finditer(r"\b(?:(?<!not\s)(?<!no\sclasses\s)before|done\s+by|end(?:ing)?\s+by|finish(?:ed)?\s+by|no\s+classes\s+after)\s+" + _TIME, lowered):
+        signals["latest"] = _normalize_time(match.group(1))
+        cover(*match.span())
+
+    for match in re.finditer(r"\b(?:open(?:\s+seats?)?|not\s+full|available\s+seats?|seats\s+available)\b", lowered):
+        signals["open_only"] = True
+        cover(*match.span())
+
+    for pattern, level in LEVEL_PHRASES:
+        for match in re.finditer(pattern, lowered):
+            signals.setdefault("level", level)
+            cover(*match.span())
+
+    for match in re.finditer(r"\bback[\s-]to[\s-]back\b|\bconsecutive\b", lowered):
+        signals["consecutive"] = True
+        cover(*match.span())
+    for match in re.finditer(r"\bbreaks?\s+between\b|\bgaps?\b", lowered):
+        signals["gaps"] = True
+        cover(*match.span())
+    for match in re.finditer(r"\brequired\b|\bmajor\s+requirements?\b", lowered):
+        signals["required"] = True
+        cover(*match.span())
+
+    for index, (_, _, token) in enumerate(tokens):
+        if token.lower() in FILLER_WORDS:
+            covered.add(index)
+
+    if not tokens:
+        return signals, 0.0
+    for index, (_, _, token) in enumerate(tokens):
+        word = token.lower()
+        if index not in covered and (word in NEGATIONS or word[0].isdigit()):
+            return signals, 0.0
+    return signals, round(len(covered) / len(tokens), 3)
+
+
+def criteria_from_signals(signals):
+    """Shape signals like extract_recommendation_criteria's JSON."""
+    subjects = signals.get("subjects", [])
+    return {
+        "subject": subjects[0] if subjects else None,
+        "excluded_subjects": signals.get("excluded_subjects", []),
+        "time_of_day": signals.get("time_of_day"),
+        "days": signals.get("days"),
+        "level": signals.get("level"),
+        "ge": signals.get("ge"),
+        "open_only": signals.get("open_only", False),
+        "difficulty": {"light": "easy", "balanced": "moderate", "challenging": "challenging"}.get(signals.get("workload")),
+        "interest_keywords": [],
+    }
+
+
+# Hard time windows for a time-of-day word (matching meeting_times.TIME_OF_DAY_RANGES)
+SCHEDULE_EARLIEST_START = {"afternoon": "12:00 PM", "evening": "5:00 PM"}
+SCHEDULE_LATEST_END = {"morning": "12:00 PM"}
+
+
+def schedule_preferences_from_signals(signals):
+    """Shape signals like extract_schedule_preferences' JSON."""
+    time_of_day = signals.get("time_of_day")
+    return {
+        "maxClassesPerDay": signals.get("max_per_day"),
+        "preferredDaysOff": signals.get("days_off"),
+        "preferredTimeOfDay": time_of_day,
+        "earliestStartTime": signals.get("earliest") or SCHEDULE_EARLIEST_START.get(time_of_day),
+        "latestEndTime": signals.get("latest") or SCHEDULE_LATEST_END.get(time_of_day),
+        "workloadPreference": signals.get("workload"),
+        "breakBetweenClasses": True if signals.get("gaps") else None,
+        "preferredSubjects": signals.get("subjects"),
+        "avoidSubjects": signals.get("excluded_subjects"),
+        "includeRequiredCourses": True if signals.get("required") else None,
+        "includeUpperDivision": True if signals.get("level") == "intermediate" else None,
+        "preferGEs": True if signals.get("prefer_ges") or signals.get("ge") else None,
+        "totalUnits": signals.get("units"),
+    }
+
+
+def student_preferences_from_signals(signals):
+    """Shape signals like extract_and_store_preferences' JSON."""
+    preferences = {
+        "preferredTimeOfDay": signals.get("time_of_day", "any"),
+        "interestAreas": signals.get("subjects", []),
+        "preferredDays": [signals["days"]] if signals.get("days") else [],
+    }
+    if signals.get("workload"):
+        preferences["workloadPreference"] = signals["workload"]
+    if signals.get("units"):
+        preferences["preferredUnitsPerQuarter"] = signals["units"]
+    if signals.get("gaps"):
+        preferences["preferGaps"] = True
+    if signals.get("consecutive"):
+        preferences["preferConsecutiveClasses"] = True
+    return preferences
@@ -0,0 +1,143 @@
+#prereqs.py
+"""Compiled prerequisite engine.
+
+Each course's prerequisite expression ("Parsed Prerequisites", a list of
+groups where every group must be satisfied by at least one of its courses)
+is parsed once into an AND-of-ORs form over an interned course-ID table.
+Eligibility for a whole catalog is then a handful of numpy operations per
+student history instead of an eval() and a nested list walk per row.
+"""
+import ast
+
+import numpy as np
+
+from catalog import normalize_code
+
+
+def parse_prerequisites(value):
+    """Parse a 'Parsed Prerequisites' value into a list of OR-groups of codes.
+
+    Accepts the stored string repr (e.g. "[['CSE 12'], ['CSE 16', 'MATH 19A']]")
+    or an already-decoded list. Anything unparseable counts as no prerequisites.
+    """
+    if value is None:
+        return []
+    if isinstance(value, float) and np.isnan(value):
+        return []
+    if isinstance(value, str):
+        value = value.strip()
+        if not value or value in ("None", "nan"):
+            return []
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return []
+    if not isinstance(value, (list, tuple)):
+        return []
+
+    groups = []
+    for group in value:
+        if isinstance(group, str):
+            group = [group]
+        if not isinstance(group, (list, tuple)):
+            continue
+        codes = [normalize_code(code) for code in group if isinstance(code, str) and code.strip()]
+        if codes:
+            groups.append(codes)
+    return groups
+
+
+class PrerequisiteEngine:
+    """Answers "which courses can this history take" for a whole catalog at once."""
+
+    def __init__(self, courses):
+        """Compile (course_code, prerequisites) pairs."""
+        self.codes = []
+        self._ids = {}
+        self._position = {}
+        members = []
+        offsets = []
+        owners = []
+
+        for code, prerequisites in courses:
+            code = normalize_code(code)
+            if not code or code in self._position:
+                continue
+            position = len(self.codes)
+            self._position[code] = position
+            self.codes.append(code)
+            for group in parse_prerequisites(prerequisites):
+                offsets.append(len(members))
+                owners.append(position)
+                members.extend(self._intern(course) for course in group)
+
+        self._members = np.asarray(members, dtype=np.int32)
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._owners = np.asarray(owners, dtype=np.int32)
+        self._codes_array = np.asarray(self.codes, dtype=object)
+        self._unlocks = None
+
+    @classmethod
+    def from_documents(cls, documents, code_field="Class Code", prereq_field="Parsed Prerequisites"):
+        return cls(
+            (doc.get(code_field, "").split(" - ")[0], doc.get(prereq_field))
+            for doc in documents
+        )
+
+    @classmethod
+    def from_dataframe(cls, df, code_column="Course Code", prereq_column="Parsed Prerequisites"):
+        base_codes = df[code_column].astype(str).str.split(" - ").str[0]
+        return cls(zip(base_codes, df[prereq_column]))
+
+    def _intern(self, code):
+        course_id = self._ids.get(code)
+        if course_id is None:
+            course_id = self._ids[code] = len(self._ids)
+        return course_id
+
+    def _history_vector(self, history):
+        taken = np.zeros(len(self._ids) + 1, dtype=bool)
+        ids = [self._ids[code] for code in map(normalize_code, history) if code in self._ids]
+        taken[ids] = True
+        return taken
+
+    def eligible_mask(self, history):
+        """Boolean array over `self.codes`: True where every prerequisite group is met."""
+        if not len(self._offsets):
+            return np.ones(len(self.codes), dtype=bool)
+        satisfied = np.logical_or.reduceat(self._history_vector(history)[self._members], self._offsets)
+        unmet = np.bincount(self._owners[~satisfied], minlength=len(self.codes))
+        return unmet == 0
+
+    def eligible(self, history, exclude_taken=True):
+        """Return the catalog codes whose prerequisites `history` satisfies."""
+        mask = self.eligible_mask(history)
+        if exclude_taken:
+            taken = [self._position[code] for code in map(normalize_code, history) if code in self._position]
+            mask[taken] = False
+        return self._codes_array[mask].tolist()
+
+    def eligible_for(self, codes, history):
+        """Boolean array aligned with `codes` (duplicates allowed); unknown codes are False."""
+        mask = np.append(self.eligible_mask(history), False)
+        positions = np.fromiter(
+            (self._position.get(normalize_code(code), -1) for code in codes),
+            dtype=np.int64,
+        )
+        return mask[positions]
+
+    def unlock_counts(self):
+        """Map each course to the number of catalog courses that list it as a prerequisite."""
+        if self._unlocks is None:
+            sizes = np.diff(np.append(self._offsets, len(self._members)))
+            pairs = np.unique(np.stack([np.repeat(self._owners, sizes), self._members]), axis=1)
+            counts = np.bincount(pairs[1], minlength=len(self._ids))
+            codes = list(self._ids)
+            self._unlocks = {codes[course_id]: int(count) for course_id, count in enumerate(counts) if count}
+        return self._unlocks
+
+    def can_take(self, history, code):
+        position = self._position.get(normalize_code(code))
+        if position is None:
+            return False
+        return bool(self.eligible_mask(history)[position])
@@ -0,0 +1,193 @@
+#prompt_builder.py
+"""Token-budgeted prompt assembly for schedule recommendations.
+
+Candidate courses are scored locally (required-ness, prerequisite
+eligibility, fit with the student's preferences and how many later courses
+they unlock), and only the best ones are packed into the prompt as a compact
+pipe-separated table until PROMPT_TOKEN_BUDGET is reached. Free-form course
+lists (e.g. every elective still open) are capped at PROMPT_LIST_TOKEN_BUDGET
+with an "and N more" tail, and charged to the same budget. Token counts use
+tiktoken when it is installed and a 4-characters-per-token estimate
+otherwise; every prompt's size is recorded and exposed through
+get_prompt_stats().
+"""
+import os
+import sys
+import threading
+
+from meeting_times import TIME_OF_DAY_RANGES, parse_days, parse_meetings
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+PROMPT_MAX_CANDIDATES = int(os.getenv("PROMPT_MAX_CANDIDATES", "40"))
+PROMPT_LIST_TOKEN_BUDGET = int(os.getenv("PROMPT_LIST_TOKEN_BUDGET", "200"))
+
+COURSE_COLUMNS = ("code", "title", "units", "times", "ge", "prereqs")
+
+REQUIRED_WEIGHT = 4.0
+ELIGIBLE_WEIGHT = 2.0
+INELIGIBLE_PENALTY = 3.0
+PREFERENCE_WEIGHT = 1.0
+UNLOCK_WEIGHT = 0.5
+MAX_UNLOCK_BONUS = 3.0
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Tokens in `text` for the chat models (estimated when tiktoken is unavailable)."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def course_row(code, title="", units="", times="", ge="", prereqs=""):
+    """One candidate course in the prompt's table layout."""
+    return {"code": code, "title": title, "units": units, "times": times, "ge": ge, "prereqs": prereqs}
+
+
+def _preference_fit(row, preferences):
+    subject = str(row["code"]).split(" ")[0]
+    fit = 0.0
+    interests = {str(area).upper() for area in [*(preferences.get("preferredSubjects") or []), *(preferences.get("interestAreas") or [])]}
+    if subject in interests:
+        fit += 1.0
+    if subject in (preferences.get("avoidSubjects") or []):
+        fit -= 2.0
+    meetings = parse_meetings(row.get("times"))
+    days_off = parse_days(preferences.get("preferredDaysOff"))
+    if days_off and any(meeting.days & days_off for meeting in meetings):
+        fit -= 1.0
+    time_range = TIME_OF_DAY_RANGES.get(str(preferences.get("preferredTimeOfDay") or preferences.get("time_preference") or "").lower())
+    if time_range and meetings:
+        fit += 0.5 if all(time_range[0] <= meeting.start < time_range[1] for meeting in meetings) else -0.5
+    return fit
+
+
+def score_course(row, required_codes=frozenset(), eligible_codes=None, preferences=None, unlock_counts=None):
+    """Local relevance score for one candidate; higher is better."""
+    code = row["code"]
+    score = 0.0
+    if code in required_codes:
+        score += REQUIRED_WEIGHT
+    if eligible_codes is not None:
+        score += ELIGIBLE_WEIGHT if code in eligible_codes else -INELIGIBLE_PENALTY
+    if preferences:
+        score += PREFERENCE_WEIGHT * _preference_fit(row, preferences)
+    if unlock_counts:
+        score += min(MAX_UNLOCK_BONUS, UNLOCK_WEIGHT * unlock_counts.get(code, 0))
+    return score
+
+
+def rank_courses(rows, required_codes=(), eligible_codes=None, preferences=None, unlock_counts=None,
+                 max_candidates=PROMPT_MAX_CANDIDATES):
+    """Deduplicate rows by code and return the best `max_candidates`, highest score first."""
+    required_codes = frozenset(required_codes)
+    unique = {}
+    for row in rows:
+        unique.setdefault(row["code"], row)
+    scored = sorted(
+        unique.values(),
+        key=lambda row: -score_course(row, required_codes, eligible_codes, preferences, unlock_counts),
+    )
+    return scored[:max_candidates]
+
+
+def _cell(value):
+    if value is None or value != value or value in ("None", "nan"):  # value != value: NaN
+        return ""
+    return " ".join(str(value).replace("|", "/").split())
+
+
+def pack_course_table(rows, budget=PROMPT_TOKEN_BUDGET, columns=COURSE_COLUMNS):
+    """Render rows as a pipe-separated table, stopping before `budget` tokens.
+
+    Returns (table, rows_included, tokens). Empty columns are dropped.
+    """
+    columns = [column for column in columns if any(_cell(row.get(column, "")) for row in rows)] or ["code"]
+    header = "|".join(columns)
+    lines = [header]
+    tokens = count_tokens(header)
+    for row in rows:
+        line = "|".join(_cell(row.get(column, "")) for column in columns)
+        line_tokens = count_tokens(line) + 1
+        if tokens + line_tokens > budget and len(lines) > 1:
+            break
+        lines.append(line)
+        tokens += line_tokens
+    return "\n".join(lines), len(lines) - 1, tokens
+
+
+def pack_code_list(codes, budget=PROMPT_LIST_TOKEN_BUDGET):
+    """Render codes as 'A, B, C and N more', stopping before `budget` tokens.
+
+    Duplicates are dropped, order is kept. Returns (text, codes_included, tokens).
+    """
+    codes = list(dict.fromkeys(codes))
+    # Leave room for the tail in case not every code fits
+    budget -= count_tokens(f" and {len(codes)} more")
+    included = []
+    tokens = 0
+    for code in codes:
+        code_tokens = count_tokens(code) + 1
+        if tokens + code_tokens > budget and included:
+            break
+        included.append(code)
+        tokens += code_tokens
+    text = ", ".join(included) or "None"
+    if len(included) < len(codes):
+        tail = f" and {len(codes) - len(included)} more"
+        text += tail
+        tokens += count_tokens(tail)
+    return text, len(included), tokens
+
+
+class PromptStats:
+    """Running totals of prompt sizes, by label."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._labels = {}
+
+    def record(self, label, prompt_tokens, rows_included, rows_total):
+        with self._lock:
+            entry = self._labels.setdefault(label, {"prompts": 0, "tokens": 0, "max_tokens": 0, "rows_dropped": 0})
+            entry["prompts"] += 1
+            entry["tokens"] += prompt_tokens
+            entry["max_tokens"] = max(entry["max_tokens"], prompt_tokens)
+            entry["rows_dropped"] += rows_total - rows_included
+            entry["last_tokens"] = prompt_tokens
+
+    def stats(self):
+        with self._lock:
+            return {
+                label: {**entry, "average_tokens": round(entry["tokens"] / entry["prompts"], 1)}
+                for label, entry in self._labels.items()
+            }
+
+
+_prompt_stats = PromptStats()
+
+
+def get_prompt_stats():
+    return _prompt_stats
+
+
+def build_messages(label, system, prompt, rows_included=0, rows_total=0):
+    """Chat messages for a prompt, recording its token count under `label`."""
+    prompt = "\n".join(line.strip() for line in prompt.strip().splitlines())
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt},
+    ]
+    prompt_tokens = count_tokens(system) + count_tokens(prompt)
+    _prompt_stats.record(label, prompt_tokens, rows_included, rows_total)
+    print(f"Prompt {label}: {prompt_tokens} tokens, {rows_included}/{rows_total} candidate courses", file=sys.stderr)
+    return messages
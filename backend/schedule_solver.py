@@ -0,0 +1,268 @@
+#schedule_solver.py
+"""Local constraint-based schedule search.
+
+Given candidate courses (each with its catalog sections), enumerate
+combinations of lecture/lab/discussion sections with a depth-first search
+that prunes on time conflicts, unit targets and days off, then rank the
+feasible schedules by the student's preferences and return the top K,
+preferring schedules that differ by more than a single course.
+"""
+import itertools
+import re
+
+from meeting_times import (
+    DAY_BITS, DAY_NAMES, DAY_ORDER, TIME_OF_DAY_RANGES, format_minutes,
+    meeting_bitmap, parse_days, parse_meetings, parse_time,
+)
+
+DEFAULT_UNITS = 5
+DEFAULT_TARGET_UNITS = 15
+UNIT_TOLERANCE = 2
+MAX_SEARCH_NODES = 200000
+# Sections with no parsed meetings (TBA) score as if they used this many campus days
+UNSCHEDULED_SECTION_DAYS = 5
+# Distinct course sets kept per requested schedule while searching
+CANDIDATE_POOL_FACTOR = 10
+# Returned schedules differ from each other in at least this many courses
+# (counted both ways, so swapping one course for another is a difference of 2)
+MIN_COURSE_DIFFERENCE = 3
+
+_COMPONENTS = {
+    "LAB": "Laboratory", "LABORATORY": "Laboratory",
+    "DIS": "Discussion", "DISC": "Discussion", "DISCUSSION": "Discussion",
+    "SEM": "Seminar", "SEMINAR": "Seminar",
+    "LEC": "Lecture", "LECTURE": "Lecture",
+}
+
+
+def parse_units(credits):
+    match = re.search(r"\d+", str(credits or ""))
+    return int(match.group()) if match else DEFAULT_UNITS
+
+
+def section_component(section, default="Lecture"):
+    """Classify a section as Lecture, Laboratory, Discussion or Seminar."""
+    for field in ("Component", "Section Type", "Class Type"):
+        value = str(section.get(field) or "").strip().upper()
+        if value in _COMPONENTS:
+            return _COMPONENTS[value]
+    return default
+
+
+def is_cancelled(section):
+    return any(
+        "cancel" in str(section.get(field) or "").lower() for field in ("Status", "Days & Times")
+    )
+
+
+def course_options(sections, days_off=0, earliest=None, latest=None):
+    """Return every conflict-free pick of one section per component for a course.
+
+    Secondary sections may be separate catalog documents or nested under a
+    lecture's 'Sections' list. Cancelled sections, and sections meeting on a
+    day off or outside the earliest/latest window, are dropped before combining.
+    """
+    by_component = {}
+    for section in sections:
+        if is_cancelled(section):
+            continue
+        entries = [(section, "Lecture")] + [
+            (dict(sub), "Discussion") for sub in section.get("Sections") or [] if isinstance(sub, dict)
+        ]
+        for entry, default_component in entries:
+            if is_cancelled(entry):
+                continue
+            component = section_component(entry, default_component)
+            entry["Component"] = component
+            meetings = parse_meetings(entry.get("Days & Times"))
+            if any(meeting.days & days_off for meeting in meetings):
+                continue
+            if earliest is not None and any(meeting.start < earliest for meeting in meetings):
+                continue
+            if latest is not None and any(meeting.end > latest for meeting in meetings):
+                continue
+            by_component.setdefault(component, []).append((entry, meetings))
+
+    if "Lecture" not in by_component:
+        return []
+
+    options = []
+    for picks in itertools.product(*by_component.values()):
+        bitmap = 0
+        conflict = False
+        for _, meetings in picks:
+            section_bitmap = meeting_bitmap(meetings)
+            if bitmap & section_bitmap:
+                conflict = True
+                break
+            bitmap |= section_bitmap
+        if not conflict:
+            options.append({
+                "sections": [entry for entry, _ in picks],
+                "meetings": [meeting for _, meetings in picks for meeting in meetings],
+                "bitmap": bitmap,
+                "unscheduled": sum(1 for _, meetings in picks if not meetings),
+            })
+    return options
+
+
+def score_schedule(picked, preferences, required_codes):
+    """Score a schedule against student_preferences; higher is better."""
+    meetings = [meeting for course in picked for meeting in course["meetings"]]
+    score = 3.0 * sum(1 for course in picked if course["code"] in required_codes)
+
+    window = TIME_OF_DAY_RANGES.get(str(preferences.get("preferredTimeOfDay") or "").lower())
+    if window and meetings:
+        score += 2.0 * sum(window[0] <= m.start < window[1] for m in meetings) / len(meetings)
+
+    preferred_days = parse_days(preferences.get("preferredDays"))
+    if preferred_days and meetings:
+        score += 2.0 * sum(not (m.days & ~preferred_days) for m in meetings) / len(meetings)
+
+    interests = [str(area).upper() for area in preferences.get("interestAreas") or preferences.get("preferredSubjects") or []]
+    if interests:
+        score += sum(1.0 for course in picked if any(course["code"].startswith(area) for area in interests))
+
+    per_day = {day: sorted((m.start, m.end) for m in meetings if m.days & DAY_BITS[day]) for day in DAY_ORDER}
+    gaps = [later[0] - earlier[1] for slots in per_day.values() for earlier, later in zip(slots, slots[1:])]
+    if gaps:
+        average_gap = sum(gaps) / len(gaps)
+        if preferences.get("preferConsecutiveClasses"):
+            score -= average_gap / 60.0
+        elif preferences.get("preferGaps") or preferences.get("breakBetweenClasses"):
+            score += min(average_gap, 90) / 60.0
+
+    max_per_day = preferences.get("maxClassesPerDay")
+    if isinstance(max_per_day, int):
+        score -= sum(max(0, len(slots) - max_per_day) for slots in per_day.values())
+
+    # Fewer days on campus is a mild tie-breaker. TBA sections are charged as if
+    # they met every weekday, so having no meeting times is never an advantage.
+    days_used = sum(1 for slots in per_day.values() if slots)
+    days_used += UNSCHEDULED_SECTION_DAYS * sum(course.get("unscheduled", 0) for course in picked)
+    return score - 0.1 * days_used
+
+
+def solve_schedules(courses, preferences, required_codes=(), top_k=3, max_nodes=MAX_SEARCH_NODES):
+    """Find the top-K conflict-free schedules.
+
+    `courses` is a list of (class_code, sections) pairs, in priority order.
+    Returns a list of {"courses", "units", "score"} dicts, best first.
+    """
+    preferences = preferences or {}
+    required_codes = set(required_codes)
+    target = preferences.get("totalUnits") or preferences.get("preferredUnitsPerQuarter") or DEFAULT_TARGET_UNITS
+    try:
+        target = int(target)
+    except (TypeError, ValueError):
+        target = DEFAULT_TARGET_UNITS
+    min_units, max_units = target - UNIT_TOLERANCE, target + UNIT_TOLERANCE
+
+    days_off = parse_days(preferences.get("preferredDaysOff"))
+    earliest = parse_time(preferences.get("earliestStartTime"))
+    latest = parse_time(preferences.get("latestEndTime"))
+
+    candidates = []
+    for code, sections in courses:
+        options = course_options(sections, days_off, earliest, latest)
+        if options:
+            units = parse_units(sections[0].get("Credits"))
+            candidates.append((code, units, options))
+
+    # Suffix sums let the search drop branches that can no longer reach min_units.
+    remaining_units = [0] * (len(candidates) + 1)
+    for index in range(len(candidates) - 1, -1, -1):
+        remaining_units[index] = remaining_units[index + 1] + candidates[index][1]
+
+    # Best schedule per distinct set of courses; section-only variants collapse into one entry.
+    pool = {}
+    pool_size = max(1, top_k) * CANDIDATE_POOL_FACTOR
+    counter = itertools.count()
+    nodes = 0
+
+    def record(picked, units):
+        score = score_schedule(picked, preferences, required_codes)
+        key = frozenset(course["code"] for course in picked)
+        current = pool.get(key)
+        if current is None or score > current[0]:
+            pool[key] = (score, next(counter), list(picked), units)
+            if len(pool) > 2 * pool_size:
+                kept = sorted(pool.items(), key=lambda item: (-item[1][0], item[1][1]))[:pool_size]
+                pool.clear()
+                pool.update(kept)
+
+    def search(index, bitmap, units, picked):
+        nonlocal nodes
+        nodes += 1
+        if nodes > max_nodes or index == len(candidates) or units + remaining_units[index] < min_units:
+            return
+
+        code, course_units, options = candidates[index]
+        if units + course_units <= max_units:
+            for option in options:
+                if bitmap & option["bitmap"]:
+                    continue
+                picked.append({"code": code, "units": course_units, **option})
+                # Each schedule is recorded once, when its last course is added.
+                if units + course_units >= min_units:
+                    record(picked, units + course_units)
+                search(index + 1, bitmap | option["bitmap"], units + course_units, picked)
+                picked.pop()
+        search(index + 1, bitmap, units, picked)
+
+    search(0, 0, 0, [])
+
+    schedules = []
+    for score, _, picked, units in diverse_top_k(pool, top_k):
+        schedules.append({
+            "courses": [{"Class Code": course["code"], "units": course["units"], "sections": course["sections"]} for course in picked],
+            "units": units,
+            "score": round(score, 3),
+        })
+    return schedules
+
+
+def diverse_top_k(pool, top_k):
+    """Pick the best `top_k` pool entries, skipping near-duplicates of ones already picked.
+
+    When there are not enough sufficiently different schedules the remaining
+    slots are filled with the next best ones.
+    """
+    ranked = sorted(pool.items(), key=lambda item: (-item[1][0], item[1][1]))
+    chosen = []
+    for codes, entry in ranked:
+        if len(chosen) == top_k:
+            break
+        if all(len(codes ^ other) >= MIN_COURSE_DIFFERENCE for other, _ in chosen):
+            chosen.append((codes, entry))
+    for codes, entry in ranked:
+        if len(chosen) >= top_k:
+            break
+        if all(codes != other for other, _ in chosen):
+            chosen.append((codes, entry))
+    return sorted((entry for _, entry in chosen), key=lambda entry: (-entry[0], entry[1]))
+
+
+def format_schedule(schedule):
+    """Render a solved schedule by day of week."""
+    lines = [f"Total units: {schedule['units']}"]
+    for course in schedule["courses"]:
+        lecture = course["sections"][0]
+        lines.append(f"- {course['Class Code']}: {lecture.get('Class Name', '')} ({course['units']} units)")
+        for section in course["sections"]:
+            room = f" in {section['Room']}" if section.get("Room") else ""
+            lines.append(f"    {section_component(section)}: {section.get('Days & Times', 'TBA')}{room}")
+
+    lines.append("")
+    for day in DAY_ORDER:
+        slots = []
+        for course in schedule["courses"]:
+            for section in course["sections"]:
+                for meeting in parse_meetings(section.get("Days & Times")):
+                    if meeting.days & DAY_BITS[day]:
+                        slots.append((meeting.start, meeting.end, course["Class Code"], section_component(section)))
+        if slots:
+            entries = ", ".join(f"{code} {component} {format_minutes(start)}-{format_minutes(end)}"
+                                for start, end, code, component in sorted(slots))
+            lines.append(f"{DAY_NAMES[day]}: {entries}")
+    return "\n".join(lines)
@@ -0,0 +1,125 @@
+#session_store.py
+"""Per-session student state (transcript-derived info and preferences).
+
+Each session's state lives in a shared backend so every worker process and
+node sees the same answers, with a small in-process LRU in front of it to
+save a round trip on chatty endpoints. Writes go through to the backend; the
+local tier only keeps entries for SESSION_LOCAL_TTL_SECONDS so another
+worker's update is picked up quickly. An update writes only the fields it
+changes (top-level names or dotted paths such as "student_info.major"), so
+concurrent updates to different fields of one session do not overwrite each
+other, and it drops the session from the local tier.
+
+Backends implement load(session_id) -> dict | None and save(session_id, fields),
+where save sets just the given (possibly dotted) fields:
+    MongoSessionBackend  documents in course.course-assistant-sessions, expired
+                         by a TTL index on updated_at (see indexes.py)
+    LocalSessionBackend  a process-local dict, for development and tests
+"""
+import copy
+import datetime
+import os
+import threading
+
+from llm_cache import LLMCache
+
+SESSION_LOCAL_SIZE = int(os.getenv("SESSION_LOCAL_SIZE", "2048"))
+SESSION_LOCAL_TTL_SECONDS = int(os.getenv("SESSION_LOCAL_TTL_SECONDS", "10"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(30 * 24 * 60 * 60)))
+
+SESSIONS_DB = "course"
+SESSIONS_COLLECTION = "course-assistant-sessions"
+
+# Session used by callers outside a request (the CLI and batch tools), which have no session token.
+DEFAULT_SESSION_ID = "default"
+
+
+def set_path(state, path, value):
+    """Set a dotted path in a nested dict, creating intermediate dicts as needed."""
+    *parents, leaf = path.split(".")
+    for key in parents:
+        child = state.get(key)
+        if not isinstance(child, dict):
+            child = state[key] = {}
+        state = child
+    state[leaf] = value
+
+
+class LocalSessionBackend:
+    """Process-local stand-in for the shared store."""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            return copy.deepcopy(self._sessions.get(session_id))
+
+    def save(self, session_id, fields):
+        with self._lock:
+            state = self._sessions.setdefault(session_id, {})
+            for path, value in fields.items():
+                set_path(state, path, copy.deepcopy(value))
+
+
+class MongoSessionBackend:
+    """One document per session, keyed by _id."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def load(self, session_id):
+        doc = self._collection.find_one({"_id": session_id}, {"_id": 0, "updated_at": 0})
+        return doc
+
+    def save(self, session_id, fields):
+        self._collection.update_one(
+            {"_id": session_id},
+            {"$set": {**fields, "updated_at": datetime.datetime.now(datetime.timezone.utc)}},
+            upsert=True
+        )
+
+
+class SessionStore:
+    """Read-through, write-through session state with an in-process LRU tier."""
+
+    def __init__(self, backend, defaults=None, local_size=SESSION_LOCAL_SIZE, local_ttl=SESSION_LOCAL_TTL_SECONDS):
+        self.backend = backend
+        self.defaults = defaults or {}
+        self._local = LLMCache(max_entries=local_size, ttl_seconds=local_ttl)
+
+    def get(self, session_id):
+        """The session's state (a copy), with defaults for anything never stored."""
+        state = self._local.get(session_id)
+        if state is None:
+            state = self.backend.load(session_id) or {}
+            self._local.set(session_id, state)
+        return copy.deepcopy({**self.defaults, **state})
+
+    def update(self, session_id, fields=None, **named_fields):
+        """Set only the given fields of the session's state.
+
+        Keyword arguments replace top-level fields; `fields` may also hold
+        dotted paths, e.g. {"student_preferences.preferredDays": ["M", "W"]}.
+        """
+        fields = {**(fields or {}), **named_fields}
+        self.backend.save(session_id, fields)
+        self._local.delete(session_id)
+
+    def stats(self):
+        stats = self._local.stats()
+        stats.pop("persistent", None)
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+
+def create_session_store(client=None, defaults=None, backend=None):
+    """Mongo-backed store when SESSION_BACKEND is "mongo" (the default with MONGO_URI set), else local.
+
+    The environment is read here, not at import, so a .env loaded after import still applies.
+    """
+    backend = backend or os.getenv("SESSION_BACKEND", "mongo" if os.getenv("MONGO_URI") else "local")
+    if backend == "mongo" and client is not None:
+        return SessionStore(MongoSessionBackend(client[SESSIONS_DB][SESSIONS_COLLECTION]), defaults)
+    return SessionStore(LocalSessionBackend(), defaults)
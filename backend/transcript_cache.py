@@ -0,0 +1,59 @@
+#transcript_cache.py
+"""Cache for uploaded transcripts, keyed by a hash of the PDF bytes.
+
+Two kinds of entries share one bounded LRU + TTL store:
+    parsed   courses_by_quarter, major, type and admission year; these only
+             depend on the PDF, so they survive catalog refreshes
+    result   the full /upload payload plus the derived student info; these
+             also depend on the catalog, the curriculum and the student's
+             preferences, so the key includes an `inputs` string built from
+             the catalog version, curriculum fingerprint and prompt fingerprint
+
+Entries are deep-copied in and out so callers can mutate what they get.
+"""
+import copy
+import hashlib
+import os
+
+from llm_cache import LLMCache
+
+TRANSCRIPT_CACHE_SIZE = int(os.getenv("TRANSCRIPT_CACHE_SIZE", "512"))
+TRANSCRIPT_CACHE_TTL_SECONDS = int(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+
+
+def transcript_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class TranscriptCache:
+    """Parsed transcripts and upload results by content hash (and, for results, their other inputs)."""
+
+    def __init__(self, max_entries=TRANSCRIPT_CACHE_SIZE, ttl_seconds=TRANSCRIPT_CACHE_TTL_SECONDS):
+        self._store = LLMCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def get_parsed(self, digest):
+        return copy.deepcopy(self._store.get(f"parsed:{digest}"))
+
+    def set_parsed(self, digest, parsed):
+        self._store.set(f"parsed:{digest}", copy.deepcopy(parsed))
+
+    def get_result(self, digest, inputs):
+        return copy.deepcopy(self._store.get(f"result:{digest}:{inputs}"))
+
+    def set_result(self, digest, inputs, result):
+        self._store.set(f"result:{digest}:{inputs}", copy.deepcopy(result))
+
+    def clear(self):
+        self._store.clear()
+
+    def stats(self):
+        stats = self._store.stats()
+        stats.pop("persistent", None)
+        return stats
+
+
+_transcript_cache = TranscriptCache()
+
+
+def get_transcript_cache():
+    return _transcript_cache
@@ -0,0 +1,93 @@
+#transcript_parser.py
+"""Single-pass tokenizer for unofficial transcript text.
+
+A course line looks like
+
+    CSE 101 Intro Data Struct & Alg 5.00 5.00 A 20.000
+
+(code, title, attempted, earned, grade, points); courses still in progress
+have no grade column. One precompiled regex, anchored on a known subject code
+followed by a course number, pulls every field out of the line at once, so
+short subjects such as CT or AM no longer match inside unrelated words.
+
+student_key() identifies the student behind a transcript: the student number
+printed in its header when there is one, otherwise a digest of the name and
+the full record (program and every quarter's courses).
+"""
+import hashlib
+import json
+import re
+from collections import namedtuple
+
+TranscriptCourse = namedtuple("TranscriptCourse", ["course_code", "course_name", "credits_earned", "grade"])
+
+IN_PROGRESS = "IP"
+
+_NUMBER = r"\d+(?:\.\d+)?"
+
+_STUDENT_NUMBER = re.compile(r"\bStudent\s*(?:ID|Number|No\.?)\s*[:#]?\s*(\d{5,})", re.IGNORECASE)
+_STUDENT_NAME = re.compile(r"^Name\s*:\s*(.+)$", re.IGNORECASE)
+
+
+def compile_course_line(subjects):
+    """Compile the course-line pattern for the given subject codes."""
+    # Longest first so HISC is tried before HIS.
+    alternatives = "|".join(re.escape(subject) for subject in sorted(set(subjects), key=len, reverse=True))
+    return re.compile(
+        rf"(?P<subject>{alternatives})\s+(?P<number>\d+[A-Z]*)\s+(?P<title>.*?)\s+"
+        rf"{_NUMBER}\s+(?P<credits>{_NUMBER})\s+(?:(?P<grade>[A-Z]{{1,2}}[+-]?)\s+)?{_NUMBER}"
+    )
+
+
+def parse_transcript_lines(cleaned_lines, course_line):
+    """Group course records under the quarter heading that precedes them."""
+    courses_by_quarter = {}
+    current = None
+    match_line = course_line.fullmatch
+    for line in cleaned_lines:
+        if 'Quarter' in line:
+            current = courses_by_quarter[line] = []
+        elif current is not None:
+            match = match_line(line)
+            if match:
+                subject, number, title, credits, grade = match.groups()
+                current.append(TranscriptCourse(f"{subject} {number}", title, credits, grade or IN_PROGRESS))
+    return courses_by_quarter
+
+
+def courses_to_dicts(courses_by_quarter):
+    """JSON-friendly copy of parse_transcript_lines() output."""
+    return {
+        quarter: [course._asdict() for course in courses]
+        for quarter, courses in courses_by_quarter.items()
+    }
+
+
+def extract_student_identity(cleaned_lines):
+    """(student_number, name) from the transcript header; either may be None."""
+    number = name = None
+    for line in cleaned_lines:
+        if number is None:
+            match = _STUDENT_NUMBER.search(line)
+            if match:
+                number = match.group(1)
+        if name is None:
+            match = _STUDENT_NAME.match(line)
+            if match:
+                name = " ".join(match.group(1).split())
+        if number and name:
+            break
+    return number, name
+
+
+def student_key(student_number, name, program, courses_by_quarter):
+    """Stable id for a student: their student number, or a digest of name, program and every course taken, by quarter."""
+    if student_number:
+        payload = ["student_number", student_number]
+    else:
+        record = [
+            [quarter, [course["course_code"] for course in courses]]
+            for quarter, courses in courses_by_quarter.items()
+        ]
+        payload = ["transcript", name, list(program), record]
+    return hashlib.sha256(json.dumps(payload, default=str).encode("utf-8")).hexdigest()
@@ -0,0 +1,95 @@
+#upload_pipeline.py
+"""Shared asyncio runtime for the /upload pipeline.
+
+One event loop runs on a daemon thread for the whole process, with an async
+MongoDB client (pymongo's AsyncMongoClient) and an AsyncOpenAI client bound
+to it. Request threads submit coroutines with run() and block only on the
+returned future, so while one upload waits on the LLM the loop keeps
+serving every other in-flight upload. Run gunicorn with threaded workers
+(e.g. --worker-class gthread --threads 16) to get that concurrency.
+"""
+import asyncio
+import os
+import sys
+import threading
+
+from clients import create_async_mongo_client, create_async_openai_client
+from llm_gateway import AsyncLLMGateway
+
+UPLOAD_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_TIMEOUT_SECONDS", "120"))
+
+
+class AsyncRuntime:
+    """Event loop thread plus the async clients that live on it."""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+        self._mongo = None
+        self._openai = None
+        self._background = set()
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="upload-pipeline", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    def run(self, coro, timeout=UPLOAD_TIMEOUT_SECONDS):
+        """Run a coroutine on the shared loop and wait for its result; cancel it on timeout."""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    @property
+    def mongo(self):
+        # Created lazily from inside the loop so the client binds to it.
+        if self._mongo is None:
+            self._mongo = create_async_mongo_client()
+        return self._mongo
+
+    @property
+    def openai(self):
+        if self._openai is None:
+            self._openai = AsyncLLMGateway(create_async_openai_client())
+        return self._openai
+
+    def fire_and_forget(self, coro, label="background task"):
+        """Schedule a coroutine on the loop without waiting for it; log failures."""
+        task = asyncio.ensure_future(coro, loop=self.loop)
+        self._background.add(task)
+
+        def done(finished):
+            self._background.discard(finished)
+            if not finished.cancelled() and finished.exception() is not None:
+                print(f"Error in {label}: {finished.exception()}", file=sys.stderr)
+
+        task.add_done_callback(done)
+        return task
+
+
+_runtime = AsyncRuntime()
+
+
+def get_async_runtime():
+    return _runtime
+
+
+async def find_one_async(db_name, collection_name, query, projection=None):
+    return await _runtime.mongo[db_name][collection_name].find_one(query, projection)
+
+
+async def find_async(db_name, collection_name, query, projection=None):
+    cursor = _runtime.mongo[db_name][collection_name].find(query, projection)
+    return await cursor.to_list(length=None)
+
+
+async def update_one_async(db_name, collection_name, query, update, upsert=False):
+    return await _runtime.mongo[db_name][collection_name].update_one(query, update, upsert=upsert)
@@ -38,7 +38,23 @@ const STORAGE_KEYS = {
   MESSAGES: 'course-assistant-messages',
   TRANSCRIPT_UPLOADED: 'course-assistant-transcript-uploaded',
   RECOMMENDED_COURSES: 'course-assistant-recommended-courses',
-  STUDENT_INFO: 'course-assistant-student-info'
+  STUDENT_INFO: 'course-assistant-student-info',
+  SESSION_ID: 'course-assistant-session-id'
+}
+
+// The backend keys transcript info and preferences on this id; it is handed out
+// in the X-Session-Id response header and must be sent back on every request
+const sessionHeaders = (): Record<string, string> => {
+  const sessionId = typeof window !== 'undefined' ? sessionStorage.getItem(STORAGE_KEYS.SESSION_ID) : null
+  return sessionId ? { 'X-Session-Id': sessionId } : {}
+}
+
+const rememberSession = (response: Response) => {
+  const sessionId = response.headers.get('X-Session-Id')
+  if (sessionId && typeof window !== 'undefined') {
+    sessionStorage.setItem(STORAGE_KEYS.SESSION_ID, sessionId)
+  }
+  return response
 }
 
 // Check if a message is requesting recommendations
@@ -135,9 +151,10 @@ export default function ChatInterface() {
       
       fetch('http://127.0.0.1:5000/upload', {
         method: 'POST',
+        headers: sessionHeaders(),
         body: formData
       })
-      .then(response => response.json())
+      .then(response => rememberSession(response).json())
       .then(data => {
         if (!data.success) {
           // Handle server-side errors
@@ -263,9 +280,11 @@ export default function ChatInterface() {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...sessionHeaders(),
         },
         body: JSON.stringify({ message: currentInput })
       })
+      rememberSession(response)
 
       if (!response.ok) {
         throw new Error('Network response was not ok')